@@ -0,0 +1,195 @@
+"""Headless load benchmark for streamlit_app.py.
+
+Drives many simulated players through the real script with Streamlit's
+AppTest: level changes, correct and wrong guesses, hint, reveal and
+new-word clicks. Gemini is replaced by a seeded FakeModel, so runs are
+deterministic and need no API key or network.
+
+    python bench_app.py --sessions 30 --rounds 20 --latency 0.3 --failure-rate 0.05
+
+Reports throughput, p50/p99 rerun latency and memory per session
+(--trace-memory for retained heap). Compare runs against a baseline with --json.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+ACTIONS = ("correct", "wrong", "hint", "reveal", "new_word", "level")
+
+
+class SimulatedPlayer:
+    """One browser session: an AppTest instance plus a seeded action picker."""
+
+    def __init__(self, player_id, seed, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.player_id = player_id
+        self.random = random.Random(seed)
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.rerun_seconds = []
+        self.actions = {name: 0 for name in ACTIONS}
+
+    def run(self, step=None):
+        """Runs one rerun (optionally after applying a widget interaction) and times it."""
+        started = time.perf_counter()
+        (step or self.app).run()
+        self.rerun_seconds.append(time.perf_counter() - started)
+        if self.app.exception:
+            raise RuntimeError(f"player {self.player_id}: {self.app.exception[0].message}")
+
+    def button(self, label_part):
+        return next(b for b in self.app.button if label_part in b.label)
+
+    def play_round(self):
+        game = self.app.session_state.game
+        action = self.random.choice(ACTIONS)
+        self.actions[action] += 1
+
+        if action in ("correct", "wrong"):
+            guess = game.word if action == "correct" else game.word[::-1] + "א"
+            self.run(self.app.text_input[0].input(guess))
+            self.run(self.button("בדוק").click())
+        elif action == "level":
+            self.run(self.app.radio[0].set_value(self.random.choice(self.app.radio[0].options)))
+        else:
+            label = {"hint": "רמז", "reveal": "גיליתי", "new_word": "מילה אחרת"}[action]
+            if not self.button(label).disabled:
+                self.run(self.button(label).click())
+
+    def session_state_bytes(self):
+        """Approximate per-session state size (pickled user keys)."""
+        data = {}
+        for key, value in self.app.session_state.to_dict().items():
+            try:
+                data[key] = pickle.dumps(value)
+            except Exception:
+                continue # Not picklable (widget internals) - skip
+        return sum(len(value) for value in data.values())
+
+
+def percentile(samples, q):
+    if not samples: return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def play_sessions(player_ids, rounds, seed, timeout, trace_memory):
+    """Plays all sessions of one worker, interleaved round-robin so they are alive together.
+
+    AppTest drives a process-wide Streamlit runtime and is not thread-safe,
+    so parallelism comes from worker processes (see --workers), just like
+    Streamlit workers behind a load balancer.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    memory_before = None
+
+    players, errors = [], []
+    for player_id in player_ids:
+        try:
+            player = SimulatedPlayer(player_id, seed + player_id, timeout)
+            player.run() # First page load
+            players.append(player)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        if trace_memory and memory_before is None:
+            # Baseline after the first session: excludes imports and process-wide caches
+            memory_before = tracemalloc.get_traced_memory()[0]
+    for _ in range(rounds):
+        for player in list(players):
+            try:
+                player.play_round()
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                players.remove(player)
+
+    retained_bytes = None
+    if trace_memory:
+        # Players are still alive here, so retained memory includes their session state
+        extra_sessions = max(1, len(players) - 1)
+        retained_bytes = (tracemalloc.get_traced_memory()[0] - memory_before) / extra_sessions * len(players)
+        tracemalloc.stop()
+    return {
+        "rerun_seconds": [s for player in players for s in player.rerun_seconds],
+        "actions": {name: sum(p.actions[name] for p in players) for name in ACTIONS},
+        "completed_sessions": len(players),
+        "session_state_bytes": [p.session_state_bytes() for p in players],
+        "retained_bytes": retained_bytes,
+        "errors": errors,
+    }
+
+
+def run_benchmark(sessions, rounds, workers, seed, timeout, trace_memory=False):
+    started = time.perf_counter()
+    shares = [list(range(i, sessions, workers)) for i in range(workers)]
+    if workers == 1:
+        parts = [play_sessions(shares[0], rounds, seed, timeout, trace_memory)]
+    else:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            parts = pool.starmap(play_sessions, [(share, rounds, seed, timeout, trace_memory) for share in shares])
+    elapsed = time.perf_counter() - started
+
+    reruns = [s for part in parts for s in part["rerun_seconds"]]
+    completed = sum(part["completed_sessions"] for part in parts)
+    state_sizes = [size for part in parts for size in part["session_state_bytes"]]
+    retained = [part["retained_bytes"] for part in parts if part["retained_bytes"] is not None]
+    errors = [error for part in parts for error in part["errors"]]
+    return {
+        "sessions": sessions,
+        "completed_sessions": completed,
+        "rounds": rounds,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "reruns": len(reruns),
+        "reruns_per_second": round(len(reruns) / elapsed, 2) if elapsed else None,
+        "rerun_p50_ms": round(percentile(reruns, 0.50) * 1000, 2) if reruns else None,
+        "rerun_p99_ms": round(percentile(reruns, 0.99) * 1000, 2) if reruns else None,
+        "rerun_mean_ms": round(statistics.fmean(reruns) * 1000, 2) if reruns else None,
+        "session_state_bytes_mean": round(statistics.fmean(state_sizes)) if state_sizes else None,
+        "retained_kib_per_session": round(sum(retained) / 1024 / max(1, completed), 1) if retained else None,
+        "actions": {name: sum(part["actions"][name] for part in parts) for name in ACTIONS},
+        "errors": errors[:10],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="simulated players")
+    parser.add_argument("--rounds", type=int, default=10, help="actions per player")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes playing in parallel")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fake model failure probability")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout, seconds")
+    parser.add_argument("--cache-dir", help="cache directory (default: a fresh temporary one)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure retained heap per session with tracemalloc (slows reruns down)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    # Must be set before the app (and its modules) are first loaded
+    os.environ["WORDGAME_FAKE_MODEL"] = f"latency={args.latency},failure_rate={args.failure_rate},seed={args.seed}"
+    os.environ["WORDGAME_CACHE_DIR"] = args.cache_dir or tempfile.mkdtemp(prefix="wordgame-bench-")
+    os.environ.pop("WORDGAME_METRICS_PORT", None)
+    # Simulated players click back to back; real ones pause longer than the click limit allows
+    os.environ["WORDGAME_CLICK_RATE"] = "0"
+
+    results = run_benchmark(args.sessions, args.rounds, max(1, args.workers), args.seed, args.timeout,
+                            args.trace_memory)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Offline word-list curation: raw Hebrew word file -> versioned word artifact.
+
+Streams the input (one word per line; "word<TAB>count" frequency lists work
+too), strips niqqud and deduplicates, assigns levels with the rules in
+levels.json, validates words the local lexicon doesn't know through a
+bounded thread pool, pre-generates hints, and writes everything to a gzipped
+JSON artifact that streamlit_app.py loads at startup.
+
+    python curate_words.py raw_words.txt -o words.json.gz
+    python curate_words.py raw_words.txt --fake-model "latency=0.01"   # local stub, no API key
+
+Verdicts and hints also land in the shared caches under .cache/, so the web
+app benefits even before it switches to the new artifact.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_client import FakeModel, GeminiClient, build_gemini_model
+from hint_bank import HintBank
+from levels import DEFAULT_CONFIG_PATH, LevelEngine, load_level_config, write_word_artifact
+from lexicon import Lexicon, read_word_file
+from word_cache import ValidityCache, check_words_validity_batch
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARTIFACT_PATH = os.path.join(APP_DIR, "words.json.gz")
+DEFAULT_LEXICON_PATH = os.path.join(APP_DIR, "hebrew_words.txt")
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def validate_words(client, words, cache, jobs, batch_size):
+    """Checks words in parallel batches. Returns {word: True/False/None}."""
+    chunks = [words[i:i + batch_size] for i in range(0, len(words), batch_size)]
+    verdicts = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for done, result in enumerate(pool.map(
+                lambda chunk: check_words_validity_batch(client, chunk, cache=cache, batch_size=batch_size),
+                chunks), start=1):
+            verdicts.update(result)
+            if done % 10 == 0 or done == len(chunks):
+                log(f"  validated {min(done * batch_size, len(words))}/{len(words)} words")
+    return verdicts
+
+
+def prebake_hints(client, hint_bank, words_by_level, jobs, variants, batch_size=15):
+    """Fills the hint bank for all words, `jobs` batches at a time. Returns {level: {word: [hints]}}."""
+    def generate(prompt):
+        response = client.generate(prompt, generation_config={'temperature': 0.7}, timeout=60)
+        return response.text if response.parts else None
+
+    work = [{level: words[i:i + batch_size]}
+            for level, words in words_by_level.items()
+            for i in range(0, len(words), batch_size)]
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(lambda chunk: hint_bank.prefill(chunk, generate, batch_size=batch_size,
+                                                      variants=variants), work))
+    return {level: {word: hint_bank.hints(word, level) for word in words if hint_bank.count(word, level)}
+            for level, words in words_by_level.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="raw word file, one word per line")
+    parser.add_argument("-o", "--output", default=DEFAULT_ARTIFACT_PATH, help="artifact path (default: %(default)s)")
+    parser.add_argument("--levels", default=DEFAULT_CONFIG_PATH, help="level rules file (default: levels.json)")
+    parser.add_argument("--lexicon", default=DEFAULT_LEXICON_PATH,
+                        help="known-good word list; these words skip model validation")
+    parser.add_argument("--api-key", default=os.getenv("GOOGLE_API_KEY"), help="Gemini API key (default: $GOOGLE_API_KEY)")
+    parser.add_argument("--model", default="gemini-1.5-flash", help="Gemini model name")
+    parser.add_argument("--fake-model", metavar="SPEC", help='use the local stub model, e.g. "latency=0.01,answer=כן"')
+    parser.add_argument("--jobs", type=int, default=4, help="parallel model calls (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=50, help="words per validity call (default: %(default)s)")
+    parser.add_argument("--hint-variants", type=int, default=3, help="hints per word, 0 to skip (default: %(default)s)")
+    parser.add_argument("--skip-validation", action="store_true", help="keep unknown words without checking them")
+    parser.add_argument("--keep-unverified", action="store_true",
+                        help="keep words whose check failed or was unclear (default: drop them)")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+
+    client = None
+    if args.fake_model is not None:
+        client = GeminiClient(FakeModel.from_spec(args.fake_model), max_concurrency=args.jobs)
+    elif args.api_key:
+        client = GeminiClient(model_factory=lambda: build_gemini_model(args.api_key, args.model),
+                              max_concurrency=args.jobs, timeout=30)
+    elif not args.skip_validation:
+        parser.error("no model available: set GOOGLE_API_KEY, pass --api-key or --fake-model, or use --skip-validation")
+
+    # 1. Stream, normalize, deduplicate and level the raw words in one pass
+    engine = LevelEngine(load_level_config(args.levels))
+    words_by_level = engine.bucket(read_word_file(args.input))
+    total = sum(len(words) for words in words_by_level.values())
+    log(f"{total} unique words in {len(words_by_level)} levels ({engine.dropped} matched no level)")
+
+    # 2. Validate words the local lexicon doesn't already know
+    if not args.skip_validation:
+        lexicon = Lexicon.from_file(args.lexicon)
+        unknown = [word for words in words_by_level.values() for word in words if word not in lexicon]
+        log(f"validating {len(unknown)} words not in the lexicon ({args.jobs} parallel calls)")
+        verdicts = validate_words(client, unknown, ValidityCache(), args.jobs, args.batch_size)
+        keep = (lambda v: v is not False) if args.keep_unverified else (lambda v: v is True)
+        rejected = {word for word, verdict in verdicts.items() if not keep(verdict)}
+        words_by_level = {level: [w for w in words if w not in rejected] for level, words in words_by_level.items()}
+        log(f"dropped {len(rejected)} words that failed validation")
+
+    # 3. Pre-generate hints
+    hints = {}
+    if client is not None and args.hint_variants > 0:
+        log(f"generating {args.hint_variants} hints per word")
+        hints = prebake_hints(client, HintBank(), words_by_level, args.jobs, args.hint_variants)
+
+    # 4. Write the artifact
+    write_word_artifact(args.output, words_by_level, hints, metadata={
+        "source": os.path.basename(args.input),
+        "created_at": time.time(),
+        "level_rules": engine.config,
+    })
+    counts = ", ".join(f"{level}: {len(words)}" for level, words in words_by_level.items())
+    log(f"wrote {args.output} ({counts}) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
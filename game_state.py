@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import time
+import uuid
+
+from shared_store import open_cache_db
+from word_cache import CACHE_DIR
+
+# Player ids travel in the page URL (?player=...) - accept only what new_player_id() makes
+_PLAYER_ID_RE = re.compile(r"^[0-9a-f]{8,32}$")
+
+
+def new_player_id():
+    return uuid.uuid4().hex
+
+
+def is_player_id(value):
+    return isinstance(value, str) and bool(_PLAYER_ID_RE.match(value))
+
+
+class GameState:
+    """Everything one player's game needs, kept under a single session_state key.
+
+    Words are stored as ids into the shared lexicon (``GameState.words``, set
+    once per process) rather than as strings, and ``__slots__`` keeps each
+    instance to a handful of pointers. Score, streak and level can be saved to
+    a score store and restored when the session comes back.
+    """
+
+    __slots__ = ("player_id", "level", "word_id", "scrambled", "score", "streak",
+                 "message", "message_type", "hint", "hint_word_id", "deck_cursors",
+                 "celebrate", "_saved")
+
+    words = None # Shared Lexicon: word id <-> word
+
+    def __init__(self, player_id, level):
+        self.player_id = player_id
+        self.level = level
+        self.word_id = -1
+        self.scrambled = ""
+        self.score = 0
+        self.streak = 0
+        self.deck_cursors = {} # level -> (seed, position) in that level's shuffled deck
+        self.celebrate = False
+        self._saved = None # Progress as last written to (or read from) the store
+        self.clear_round()
+
+    @property
+    def word(self):
+        """The word to guess, as a string."""
+        return self.words[self.word_id] if self.word_id >= 0 else None
+
+    @property
+    def has_hint(self):
+        """True if a hint is stored for the current word."""
+        return self.hint is not None and self.hint_word_id == self.word_id
+
+    def start_word(self, word_id, scrambled):
+        self.word_id = word_id
+        self.scrambled = scrambled
+        self.clear_round()
+
+    def clear_feedback(self):
+        self.message = None
+        self.message_type = None
+
+    def clear_round(self):
+        """Forgets everything about the current round except the word itself."""
+        self.clear_feedback()
+        self.hint = None
+        self.hint_word_id = -1
+
+    def set_message(self, message, message_type):
+        self.message = message
+        self.message_type = message_type
+
+    def set_hint(self, hint, word_id):
+        self.hint = hint
+        self.hint_word_id = word_id
+
+    def progress(self):
+        return (self.level, self.score, self.streak)
+
+    def restore(self, progress, levels):
+        """Applies saved (level, score, streak); ignores levels that no longer exist."""
+        if progress is None: return
+        level, self.score, self.streak = progress
+        if level in levels:
+            self.level = level
+        self._saved = self.progress()
+
+    def save(self, store):
+        """Writes progress to the store if it changed since the last save."""
+        if store is None: return
+        progress = self.progress()
+        if progress != self._saved:
+            store.save(self.player_id, *progress)
+            self._saved = progress
+
+
+# --- Score Stores (pluggable: anything with load() and save()) ---
+
+class MemoryScoreStore:
+    """Keeps progress in this process only: survives session eviction, not restarts
+    (and with several workers, only sessions that land on the same worker see it)."""
+
+    def __init__(self):
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def load(self, player_id):
+        with self._lock:
+            return self._progress.get(player_id)
+
+    def save(self, player_id, level, score, streak):
+        with self._lock:
+            self._progress[player_id] = (level, score, streak)
+
+
+class SQLiteScoreStore:
+    """Keeps progress per player in SQLite, so scores survive worker restarts.
+
+    Players not seen for ``ttl_seconds`` are dropped when the store opens and
+    then every ``prune_every`` saves, so long-running workers expire them too.
+    """
+
+    def __init__(self, path=None, ttl_seconds=180 * 24 * 3600, prune_every=1000):
+        self.path = path or os.path.join(CACHE_DIR, "scores.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        self._saves_since_prune = 0
+        self._lock = threading.Lock()
+
+        self._conn = open_cache_db(self.path) # Shared by all workers in multi-worker mode
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            " player_id TEXT PRIMARY KEY, level TEXT NOT NULL, score INTEGER NOT NULL,"
+            " streak INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._prune()
+
+    def load(self, player_id):
+        """Returns (level, score, streak) or None for an unknown player."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT level, score, streak FROM progress WHERE player_id = ?", (player_id,)
+            ).fetchone()
+
+    def save(self, player_id, level, score, streak):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress (player_id, level, score, streak, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (player_id, level, score, streak, time.time()),
+            )
+            self._conn.commit()
+            self._saves_since_prune += 1
+            prune = self._saves_since_prune >= self.prune_every
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        """Drops players not seen for ttl_seconds."""
+        with self._lock:
+            self._saves_since_prune = 0
+            self._conn.execute("DELETE FROM progress WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+
+def open_score_store(kind="sqlite", path=None):
+    """Builds the store named by `kind`: "sqlite", "memory", or "none" (returns None)."""
+    if kind == "sqlite":
+        return SQLiteScoreStore(path)
+    if kind == "memory":
+        return MemoryScoreStore()
+    if kind == "none":
+        return None
+    raise ValueError(f"unknown score store: {kind!r}")
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def build_gemini_model(api_key, model_name):
+    """Imports the Gemini SDK (only now, on first use) and builds a model bound to `api_key`."""
+    return GeminiModel(api_key, model_name)
+
+
+class GeminiModel:
+    """The part of genai.GenerativeModel the app uses, bound to one API key.
+
+    genai.GenerativeModel takes its key from the SDK's process-global
+    configuration (genai.configure()), which would mix up players' keys. This
+    sends the request through the SDK's public service client, created with
+    its own key, and wraps the reply in the SDK's response type - so callers
+    read .text, .parts and .prompt_feedback as usual.
+    """
+
+    def __init__(self, api_key, model_name):
+        import google.generativeai as genai
+        from google.ai import generativelanguage as glm
+        self._genai = genai
+        self._glm = glm
+        self.model_name = model_name if "/" in model_name else f"models/{model_name}"
+        self._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        glm = self._glm
+        request = glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(**(generation_config or {})),
+        )
+        response = self._client.generate_content(request, **(request_options or {}))
+        return self._genai.types.GenerateContentResponse.from_response(response)
+
+
+class GeminiClient:
+    """Thread-pool wrapper around a genai.GenerativeModel shared by all sessions.
+
+    - Identical in-flight requests (same prompt and generation config) are
+      coalesced into a single upstream call whose result every caller shares.
+    - At most `max_concurrency` upstream calls run at once; the rest queue.
+    - Failed calls are retried with exponential backoff and jitter.
+    - Callers wait at most `deadline` seconds; a late result still completes
+      in the background and is handed to anyone coalesced onto it.
+    """
+
+    def __init__(self, model=None, max_concurrency=4, timeout=10.0, retries=2, backoff=0.5,
+                 model_factory=None):
+        # Either a ready model, or a factory called on the first request (keeps the SDK
+        # import and client setup off the path of players who never use AI features)
+        self._model = model
+        self._model_factory = model_factory
+        self._model_lock = threading.Lock()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini")
+        self._in_flight = {} # request key -> Future
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._model_factory()
+        return self._model
+
+    def submit(self, prompt, generation_config=None, timeout=None):
+        """Starts (or joins) a request and returns a concurrent.futures.Future."""
+        key = (prompt, tuple(sorted((generation_config or {}).items())), timeout)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced_calls += 1
+                return future
+            self.upstream_calls += 1
+            future = self._executor.submit(self._call_with_retry, prompt, generation_config,
+                                           timeout or self.timeout)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def generate(self, prompt, generation_config=None, timeout=None, deadline=None):
+        """Blocking call: returns the model response or raises (TimeoutError past the deadline)."""
+        timeout = timeout or self.timeout
+        future = self.submit(prompt, generation_config, timeout)
+        return future.result(timeout=deadline or timeout * (self.retries + 1))
+
+    async def generate_async(self, prompt, generation_config=None, timeout=None, deadline=None):
+        """Awaitable version of generate() for asyncio callers."""
+        timeout = timeout or self.timeout
+        future = asyncio.wrap_future(self.submit(prompt, generation_config, timeout))
+        # shield() keeps a timed-out caller from cancelling a request others may share
+        return await asyncio.wait_for(asyncio.shield(future),
+                                      deadline or timeout * (self.retries + 1))
+
+    def close(self):
+        """Stops taking requests; calls already running finish in the background."""
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "upstream_calls": self.upstream_calls,
+                "coalesced_calls": self.coalesced_calls,
+                "in_flight": len(self._in_flight),
+            }
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _call_with_retry(self, prompt, generation_config, timeout):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={'timeout': timeout},
+                )
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                # 0.5s, 1s, 2s ... with jitter so coalesced bursts don't retry in lockstep
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+# --- Local Fake Model (tests, benchmarks, offline development) ---
+
+class FakeResponse:
+    """Mimics the parts of a genai response the app reads."""
+
+    class _Feedback:
+        block_reason = "SAFETY"
+
+    def __init__(self, text):
+        self.text = text or ""
+        self.parts = [self.text] if text else []
+        self.prompt_feedback = self._Feedback()
+
+
+def fake_responder(prompt, answer="כן"):
+    """Answers the app's prompt kinds: batch hints (JSON), single hints, batch and single yes/no checks."""
+    numbered = [line.split(".", 1)[0] for line in prompt.splitlines() if line[:1].isdigit() and "." in line]
+    if numbered:
+        return "\n".join(f"{number}: {answer}" for number in numbered)
+    if "JSON" in prompt:
+        words = [line[2:].strip() for line in prompt.splitlines() if line.startswith("- ")]
+        return json.dumps({word: ["רמז לדוגמה ממודל מקומי", "עוד רמז לדוגמה"] for word in words},
+                          ensure_ascii=False)
+    if "רמז" in prompt:
+        return "רמז לדוגמה ממודל מקומי"
+    return answer
+
+
+class FakeModel:
+    """Deterministic stand-in for genai.GenerativeModel.
+
+    `responder(prompt)` returns the answer text (default: fake_responder).
+    Each call sleeps `latency` seconds and fails with probability
+    `failure_rate`, drawn from a seeded RNG so runs are reproducible.
+    """
+
+    def __init__(self, answer="כן", latency=0.0, failure_rate=0.0, seed=0, responder=None):
+        self.answer = answer
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.responder = responder
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Builds a fake from "latency=0.2,failure_rate=0.1,seed=7,answer=לא" (all optional)."""
+        kwargs = {}
+        for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+            name, _, value = item.partition("=")
+            if name in ("latency", "failure_rate"):
+                kwargs[name] = float(value)
+            elif name == "seed":
+                kwargs[name] = int(value)
+            elif name == "answer":
+                kwargs[name] = value
+            else:
+                raise ValueError(f"unknown FakeModel option: {name!r}")
+        return cls(**kwargs)
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("FakeModel: simulated API failure")
+        return FakeResponse(self.responder(prompt) if self.responder else fake_responder(prompt, self.answer))
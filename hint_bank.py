@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import threading
+import time
+
+from lexicon import normalize_word
+from shared_store import open_cache_db
+from word_cache import CACHE_DIR
+
+# Code fences the model sometimes wraps around JSON answers
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def build_batch_prompt(words, level, variants):
+    """Builds one prompt asking for several hint variants for each of the words."""
+    word_lines = "\n".join(f"- {word}" for word in words)
+    return f"""
+אני בונה משחק ניחוש מילים בעברית לילדים ברמה '{level}'.
+לכל אחת מהמילים הבאות, כתוב/י {variants} רמזים שונים: קצרים, פשוטים וקלים להבנה, שמתאימים לילדים ולרמת הקושי '{level}'.
+אסור להשתמש במילה עצמה או בשורש שלה ברמז. כל רמז הוא משפט אחד קצר וברור.
+המילים:
+{word_lines}
+החזר/י JSON בלבד, בלי טקסט נוסף, במבנה: {{"מילה": ["רמז 1", "רמז 2"]}}
+"""
+
+
+def parse_batch_response(text, words):
+    """Parses the model's JSON answer into {word: [hints]} for the requested words only."""
+    try:
+        data = json.loads(_FENCE_RE.sub("", (text or "").strip()))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for word in words:
+        hints = data.get(word)
+        if isinstance(hints, str):
+            hints = [hints]
+        if not isinstance(hints, list):
+            continue
+        # Same sanity rules as live hints: not too short, and no giving the word away
+        clean = [h.strip().replace("*", "") for h in hints if isinstance(h, str)]
+        clean = [h for h in clean if len(h) > 3 and word not in h]
+        if clean:
+            parsed[word] = clean
+    return parsed
+
+
+class HintBank:
+    """Store of pre-generated hints keyed by (word, level), several variants each.
+
+    Hints are filled ahead of time by a background batch job (one model call
+    for many words) and kept in SQLite so they survive restarts. Reads are
+    served from memory and rotate through the variants.
+
+    With `shared=True` (several workers on one file) nothing is preloaded:
+    every read goes to the shared table, so a hint stored by any worker is
+    served by all of them and memory doesn't grow with the worker count.
+    """
+
+    def __init__(self, path=None, shared=False):
+        self.path = path or os.path.join(CACHE_DIR, "hints.sqlite3")
+        self.shared = shared
+        self._hints = {} # (word, level) -> [hint, ...] (not used when shared)
+        self._rotation = {} # (word, level) -> next variant index
+        self._lock = threading.RLock() # add() reads the shared table while holding it
+        self._prefill_thread = None
+
+        self._conn = open_cache_db(self.path, shared=shared)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hints ("
+            " word TEXT NOT NULL, level TEXT NOT NULL, hint TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (word, level, hint))"
+        )
+        if not shared:
+            for word, level, hint in self._conn.execute(
+                    "SELECT word, level, hint FROM hints ORDER BY created_at"):
+                self._hints.setdefault((word, level), []).append(hint)
+
+    def has_hints(self, word, level):
+        return bool(self._variants((normalize_word(word), level)))
+
+    def count(self, word, level):
+        return len(self._variants((normalize_word(word), level)))
+
+    def hints(self, word, level):
+        """Returns all stored hint variants for (word, level)."""
+        return list(self._variants((normalize_word(word), level)))
+
+    def next_hint(self, word, level):
+        """Returns the next hint variant for (word, level), or None on a miss."""
+        key = (normalize_word(word), level)
+        variants = self._variants(key)
+        if not variants:
+            return None
+        with self._lock:
+            index = self._rotation.get(key, 0)
+            self._rotation[key] = index + 1
+        return variants[index % len(variants)]
+
+    def _variants(self, key):
+        if not self.shared:
+            return self._hints.get(key, ())
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT hint FROM hints WHERE word = ? AND level = ? ORDER BY created_at", key)]
+
+    def add(self, word, level, hints):
+        """Stores new hint variants, ignoring ones already in the bank."""
+        key = (normalize_word(word), level)
+        now = time.time()
+        with self._lock:
+            existing = self._variants(key)
+            new_hints = [h for h in dict.fromkeys(hints) if h and h not in existing]
+            if not self.shared:
+                self._hints.setdefault(key, []).extend(new_hints)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO hints (word, level, hint, created_at) VALUES (?, ?, ?, ?)",
+                [(key[0], level, hint, now) for hint in new_hints],
+            )
+            self._conn.commit()
+
+    def prefill(self, words_by_level, generate, batch_size=15, variants=3):
+        """Generates hints for every word that has fewer than `variants` of them.
+
+        `generate(prompt)` returns the model's text (or None on failure); it is
+        called once per batch of `batch_size` words. Failed batches are skipped
+        and retried on the next prefill run.
+        """
+        for level, words in words_by_level.items():
+            missing = [w for w in words if self.count(w, level) < variants]
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                try:
+                    text = generate(build_batch_prompt(batch, level, variants))
+                except Exception:
+                    continue # Live hints still work; this batch is retried next time
+                for word, hints in parse_batch_response(text, batch).items():
+                    self.add(word, level, hints)
+
+    def start_prefill(self, words_by_level, generate, **kwargs):
+        """Runs prefill() on a daemon thread, once at a time. Returns the thread."""
+        with self._lock:
+            if self._prefill_thread is not None and self._prefill_thread.is_alive():
+                return self._prefill_thread
+            self._prefill_thread = threading.Thread(
+                target=self.prefill, args=(words_by_level, generate), kwargs=kwargs,
+                name="hint-prefill", daemon=True,
+            )
+            self._prefill_thread.start()
+            return self._prefill_thread
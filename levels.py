@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import json
+import os
+
+from lexicon import normalize_word, read_word_file
+from shared_store import remove_stale
+from word_cache import CACHE_DIR
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels.json")
+# Level fields that decide which words go where (see LevelEngine.level_for)
+BUCKETING_FIELDS = ("name", "min_length", "max_length", "min_difficulty", "max_difficulty", "max_rank")
+
+# Approximate letter frequencies in modern Hebrew text (percent). Final forms
+# share the frequency of their regular letter.
+LETTER_FREQUENCIES = {
+    "א": 6.3, "ב": 4.7, "ג": 1.3, "ד": 2.6, "ה": 8.7, "ו": 10.4, "ז": 0.9, "ח": 2.3,
+    "ט": 1.2, "י": 11.1, "כ": 2.7, "ך": 2.7, "ל": 7.4, "מ": 6.9, "ם": 6.9, "נ": 4.4,
+    "ן": 4.4, "ס": 1.5, "ע": 3.2, "פ": 1.9, "ף": 1.9, "צ": 1.3, "ץ": 1.3, "ק": 1.9,
+    "ר": 5.6, "ש": 4.5, "ת": 5.3,
+}
+_MAX_FREQUENCY = max(LETTER_FREQUENCIES.values())
+
+
+def letter_difficulty(word):
+    """Scores a word 0..1 by how rare its letters are (0 = only the most common letters)."""
+    if not word: return 0.0
+    rarities = [1 - LETTER_FREQUENCIES.get(ch, 0.0) / _MAX_FREQUENCY for ch in word]
+    return sum(rarities) / len(rarities)
+
+
+def load_level_config(path=DEFAULT_CONFIG_PATH):
+    """Reads the level rules file. Returns the parsed config dict."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    if not config.get("levels"):
+        raise ValueError(f"{path}: no levels defined")
+    return config
+
+
+class LevelEngine:
+    """Assigns words to levels using the rules from levels.json.
+
+    Each level may bound the word length (min_length/max_length), the
+    letter-frequency difficulty score (min_difficulty/max_difficulty) and the
+    word's frequency rank in the corpus (max_rank). A word goes to the first
+    level whose rules all match, else to `fallback_level`; words matching
+    nothing are counted in `dropped` instead of vanishing silently.
+    (A level's `scramble_range` is not a bucketing rule: the app uses it to pick
+    how hard the scrambles for that level are, see scrambler.ScrambleEngine.)
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.levels = {level["name"]: level for level in config["levels"]}
+        self.fallback_level = config.get("fallback_level")
+        self.dropped = 0
+
+    def level_for(self, word, rank=None):
+        """Returns the level name for a word, or the fallback level (may be None)."""
+        length = len(word)
+        difficulty = None # Computed only if some rule needs it
+        for name, rules in self.levels.items():
+            if rules.get("min_length") is not None and length < rules["min_length"]: continue
+            if rules.get("max_length") is not None and length > rules["max_length"]: continue
+            if rules.get("max_rank") is not None and (rank is None or rank > rules["max_rank"]): continue
+            if rules.get("min_difficulty") is not None or rules.get("max_difficulty") is not None:
+                if difficulty is None:
+                    difficulty = letter_difficulty(word)
+                if rules.get("min_difficulty") is not None and difficulty < rules["min_difficulty"]: continue
+                if rules.get("max_difficulty") is not None and difficulty > rules["max_difficulty"]: continue
+            return name
+        return self.fallback_level
+
+    def bucket(self, words):
+        """Buckets a stream of words into {level: [words]} in a single pass.
+
+        Words are normalized and deduplicated; a word's rank is its position in
+        the stream, so frequency-sorted corpora give meaningful max_rank rules.
+        """
+        words_by_level = {name: [] for name in self.levels}
+        seen = set()
+        self.dropped = 0
+        rank = 0
+        for word in words:
+            word = normalize_word(word)
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            rank += 1
+            level = self.level_for(word, rank)
+            if level is None:
+                self.dropped += 1
+            else:
+                words_by_level[level].append(word)
+        return words_by_level
+
+    def load_or_build(self, corpus_path=None, extra_words=(), cache_dir=CACHE_DIR):
+        """Returns {level: tuple(words)}, from the on-disk index when it is still fresh.
+
+        The index file is keyed on the bucketing rules, the corpus file's
+        size/mtime and the extra words, so any change that moves words rebuilds
+        it (and removes the old file); otherwise startup is one JSON read
+        instead of a pass over the corpus.
+        """
+        # Only the rules that decide bucketing: editing an emoji or scramble_range keeps the index
+        rules = [{field: level.get(field) for field in BUCKETING_FIELDS} for level in self.config["levels"]]
+        fingerprint = hashlib.sha1(json.dumps(
+            [rules, self.fallback_level, _file_signature(corpus_path), list(extra_words)],
+            ensure_ascii=False, sort_keys=True,
+        ).encode("utf-8")).hexdigest()[:16]
+        index_path = os.path.join(cache_dir, f"levels-{fingerprint}.json")
+
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                stored = json.load(f)
+            self.dropped = stored["dropped"]
+            return {level: tuple(words) for level, words in stored["levels"].items()}
+
+        def corpus():
+            if corpus_path:
+                yield from read_word_file(corpus_path)
+            yield from extra_words
+        words_by_level = self.bucket(corpus())
+
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{index_path}.{os.getpid()}.tmp" # Workers may build the same index at once
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"levels": words_by_level, "dropped": self.dropped}, f, ensure_ascii=False)
+        os.replace(temp_path, index_path) # Atomic, so a concurrent reader never sees half a file
+        remove_stale(cache_dir, "levels-", os.path.basename(index_path)) # Older rules or corpora
+        return {level: tuple(words) for level, words in words_by_level.items()}
+
+
+def _file_signature(path):
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+# --- Curated Word Artifact (written by curate_words.py, loaded by the app) ---
+
+ARTIFACT_FORMAT = "wordgame-words"
+ARTIFACT_VERSION = 1
+
+
+def write_word_artifact(path, words_by_level, hints=None, metadata=None):
+    """Writes {level: [words]} plus {level: {word: [hints]}} as gzipped, versioned JSON."""
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "metadata": metadata or {},
+        "levels": {level: list(words) for level, words in words_by_level.items()},
+        "hints": hints or {},
+    }
+    temp_path = path + ".tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def load_word_artifact(path):
+    """Loads an artifact written by write_word_artifact. Raises ValueError on a format/version mismatch."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact.get("format") != ARTIFACT_FORMAT or artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"{path}: unsupported word artifact "
+                         f"({artifact.get('format')!r} v{artifact.get('version')!r})")
+    artifact["levels"] = {level: tuple(words) for level, words in artifact["levels"].items()}
+    return artifact
@@ -0,0 +1,268 @@
+import bisect
+import hashlib
+import mmap
+import os
+import re
+import struct
+from array import array
+from itertools import accumulate
+
+import numpy as np
+
+from shared_store import file_lock, remove_stale
+
+# Niqqud and cantillation marks (U+0591-U+05C7) are dropped so that
+# "שָׁלוֹם" and "שלום" are treated as the same word.
+_NIQQUD_RE = re.compile("[\u0591-\u05C7]")
+
+# Compiled lexicon file: magic and section count, the section sizes, then each section
+# (8-byte aligned) exactly as it is laid out in memory. Sections: word offsets, word
+# blob, then the AnagramIndex arrays - signature keys, group starts, word ids.
+_COMPILED_MAGIC = b"WGLEX\x00\x03\x00"
+_COMPILED_HEADER = struct.Struct("<8sI")
+_SECTION_ALIGN = 8
+
+
+def normalize_word(word):
+    """Normalizes a word for lookups: trims whitespace and strips niqqud."""
+    if not word: return ""
+    return _NIQQUD_RE.sub("", word).strip()
+
+
+def read_word_file(path):
+    """Yields normalized words from a text file, one per line.
+
+    Blank lines and '#' comments are skipped. Only the first whitespace-separated
+    field is used, so frequency lists like "word<TAB>count" work too. The file
+    is streamed in ~1MB chunks and niqqud is stripped once per chunk.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        while True:
+            lines = f.readlines(1 << 20)
+            if not lines:
+                break
+            for line in _NIQQUD_RE.sub("", "".join(lines)).splitlines():
+                fields = line.split(None, 1)
+                if fields and not fields[0].startswith("#"):
+                    yield fields[0]
+
+
+class Lexicon:
+    """Read-only set of known Hebrew words for local validity checks.
+
+    All words live in one sorted UTF-8 blob ("\\n"-separated) plus an array of
+    start offsets, which takes a fraction of the memory of a set of str
+    objects. Membership is a binary search over the blob: a few microseconds
+    even for hundreds of thousands of words.
+    """
+
+    def __init__(self, words=()):
+        self._build({normalize_word(w) for w in words})
+
+    @classmethod
+    def from_file(cls, path, extra_words=()):
+        """Loads a word list file (see read_word_file) plus any extra words."""
+        words = set(read_word_file(path)) # Already normalized
+        words.update(normalize_word(w) for w in extra_words)
+        lexicon = cls.__new__(cls)
+        lexicon._build(words)
+        return lexicon
+
+    def _build(self, unique_words):
+        unique_words.discard("")
+        # UTF-8 byte order matches code point order, so sorting the str is enough
+        encoded = [w.encode("utf-8") for w in sorted(unique_words)]
+        self._blob = b"\n".join(encoded)
+        self._offsets = array("I", accumulate((len(w) + 1 for w in encoded), initial=0))
+
+    def save(self, path):
+        """Writes the lexicon and its AnagramIndex in the compiled binary format read
+        by open() (atomically)."""
+        anagrams = AnagramIndex(self)
+        sections = [self._offsets, self._blob, anagrams._signature_keys, anagrams._group_starts,
+                    anagrams._word_ids]
+        sections = [memoryview(section).cast("B") for section in sections]
+        header = _COMPILED_HEADER.pack(_COMPILED_MAGIC, len(sections)) + array(
+            "I", (len(section) for section in sections)).tobytes()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(header + b"\0" * (-len(header) % _SECTION_ALIGN))
+            for section in sections:
+                f.write(section)
+                f.write(b"\0" * (-len(section) % _SECTION_ALIGN))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        """Maps a compiled lexicon file read-only, without copying it.
+
+        Every process that opens the same file shares its pages through the
+        OS page cache, so N workers cost one copy of the word list, not N.
+        An AnagramIndex over the mapped lexicon uses the groups compiled into
+        the file instead of building its own.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _COMPILED_HEADER.unpack_from(mapped)
+        if magic != _COMPILED_MAGIC:
+            raise ValueError(f"{path}: not a compiled lexicon")
+        start = _COMPILED_HEADER.size + count * 4
+        sizes = memoryview(mapped)[_COMPILED_HEADER.size:start].cast("I")
+        start += -start % _SECTION_ALIGN
+        sections = []
+        for size in sizes:
+            sections.append(memoryview(mapped)[start:start + size])
+            start += size + (-size % _SECTION_ALIGN)
+        offsets, blob, signature_keys, group_starts, word_ids = sections
+        lexicon = cls._from_buffers(offsets.cast("I"), blob)
+        lexicon._anagram_groups = (signature_keys.cast("Q"), group_starts.cast("I"), word_ids.cast("I"))
+        lexicon._mapped = mapped
+        lexicon.path = path
+        return lexicon
+
+    @classmethod
+    def _from_buffers(cls, offsets, blob):
+        lexicon = cls.__new__(cls)
+        lexicon._offsets = offsets
+        lexicon._blob = blob
+        return lexicon
+
+    @classmethod
+    def load_shared(cls, path, extra_words, cache_dir):
+        """from_file() for several worker processes: compiled once, then mapped by all.
+
+        The compiled file is keyed on the word file's size/mtime and the extra
+        words. The first worker to take the lock builds it; the others wait for
+        it and map the result instead of building their own copy. The builder
+        then removes files compiled for an older fingerprint.
+        """
+        extra_words = sorted(set(extra_words))
+        stat = os.stat(path) if os.path.exists(path) else None
+        fingerprint = hashlib.sha1("\n".join(
+            [repr((_COMPILED_MAGIC, os.path.abspath(path), stat and stat.st_size, stat and stat.st_mtime_ns))]
+            + extra_words
+        ).encode("utf-8")).hexdigest()[:16]
+        compiled_path = os.path.join(cache_dir, f"lexicon-{fingerprint}.bin")
+        if not os.path.exists(compiled_path):
+            with file_lock(compiled_path + ".lock"):
+                if not os.path.exists(compiled_path): # Not built while we waited for the lock
+                    cls.from_file(path, extra_words).save(compiled_path)
+                    # Files for an older word list are never read again (workers that
+                    # still have one mapped keep their pages until they exit)
+                    remove_stale(cache_dir, "lexicon-", os.path.basename(compiled_path))
+        return cls.open(compiled_path)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, word_id):
+        return self._word_bytes(word_id).decode("utf-8")
+
+    def __iter__(self):
+        if not self._blob:
+            return iter(())
+        return (w.decode("utf-8") for w in bytes(self._blob).split(b"\n"))
+
+    def __contains__(self, word):
+        return self.index(word) >= 0
+
+    def index(self, word):
+        """Returns the word's position in the lexicon, or -1 if it is unknown."""
+        key = normalize_word(word).encode("utf-8")
+        if not key: return -1
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._word_bytes(mid)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _word_bytes(self, word_id):
+        # bytes() copies just this word when the blob is a mapped file
+        return bytes(self._blob[self._offsets[word_id]:self._offsets[word_id + 1] - 1])
+
+
+# Final letter forms (sofit) fold to their regular form, since an anagram may
+# move the letter out of the final position: "ים" and "מי" share a signature.
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+
+
+def letter_signature(word):
+    """Returns the sorted-letter key shared by all anagrams of a word."""
+    return "".join(sorted(normalize_word(word).translate(_FINAL_LETTERS)))
+
+
+# Random odd multipliers for hashing a signature to one uint64 (one per letter
+# position, cycled; wraps mod 2**64). _signature_key() and AnagramIndex's numpy
+# build must agree, so both use these.
+_KEY_MULTIPLIERS = np.random.default_rng(1).integers(1, 2**63, size=64, dtype=np.uint64) | np.uint64(1)
+_KEY_MULTIPLIER_INTS = [int(m) for m in _KEY_MULTIPLIERS]
+
+
+def _signature_key(signature):
+    return sum(ord(letter) * _KEY_MULTIPLIER_INTS[i % 64] for i, letter in enumerate(signature)) & (2**64 - 1)
+
+
+class AnagramIndex:
+    """Maps each sorted-letter signature to the known words spelled with those letters.
+
+    Built once over a Lexicon with numpy as three flat arrays: a 64-bit hash
+    key per distinct signature (sorted, so lookup is a binary search), the
+    word ids of every group back to back in key order, and where each group
+    starts. Lookups check the words' real signatures, so a hash collision
+    can't return a wrong word. Over a mapped lexicon (Lexicon.open) the arrays
+    come from the file, so workers share them instead of each building a copy.
+    """
+
+    def __init__(self, lexicon):
+        self._lexicon = lexicon
+        compiled = getattr(lexicon, "_anagram_groups", None)
+        if compiled is not None:
+            self._signature_keys, self._group_starts, self._word_ids = compiled
+            return
+        # Lexicon words are already normalized: decode and fold finals over the whole
+        # blob at once, then sort each word's letters with one lexsort over all letters
+        keys = np.empty(0, dtype=np.uint64)
+        if len(lexicon):
+            text = bytes(lexicon._blob).decode("utf-8").translate(_FINAL_LETTERS)
+            codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+            is_letter = codes != ord("\n")
+            lengths = np.diff(np.flatnonzero(np.concatenate(([True], ~is_letter, [True])))) - 1
+            letters = codes[is_letter]
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            word_of_letter = np.repeat(np.arange(len(lengths)), lengths)
+            sorted_letters = letters[np.lexsort((letters, word_of_letter))]
+            position = np.arange(len(letters)) - np.repeat(starts, lengths)
+            weighted = sorted_letters.astype(np.uint64) * _KEY_MULTIPLIERS[position % len(_KEY_MULTIPLIERS)]
+            keys = np.add.reduceat(weighted, starts, dtype=np.uint64)
+
+        word_ids = np.argsort(keys, kind="stable")
+        signature_keys, group_starts = np.unique(keys[word_ids], return_index=True)
+        self._signature_keys = signature_keys
+        self._group_starts = np.append(group_starts, len(word_ids)).astype(np.uint32)
+        self._word_ids = word_ids.astype(np.uint32)
+
+    def __len__(self):
+        return len(self._signature_keys)
+
+    def anagrams(self, letters):
+        """Returns all known words that use exactly these letters (in any order)."""
+        signature = letter_signature(letters)
+        key = _signature_key(signature)
+        group = bisect.bisect_left(self._signature_keys, key)
+        if group == len(self._signature_keys) or self._signature_keys[group] != key: return ()
+        words = (self._lexicon[word_id] for word_id in
+                 self._word_ids[self._group_starts[group]:self._group_starts[group + 1]])
+        return tuple(word for word in words if letter_signature(word) == signature)
+
+    def is_anagram_word(self, guess, letters):
+        """True if the guess is a known word made of exactly the given letters."""
+        return (letter_signature(guess) == letter_signature(letters)
+                and normalize_word(guess) in self.anagrams(letters))
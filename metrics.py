@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" buckets)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metrics:
+    """In-process latency histograms, counters and gauges.
+
+    Shared by all sessions of a worker. Exported as Prometheus text (served
+    over HTTP or written to a file) and as JSONL snapshots with p50/p99.
+    """
+
+    def __init__(self, prefix="wordgame"):
+        self.prefix = prefix
+        self._histograms = {} # name -> [per-bucket counts..., +Inf count]
+        self._sums = {} # name -> total seconds
+        self._counters = {}
+        self._gauges = {}
+        self._last_jsonl_write = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        """Records one latency sample for `name`."""
+        with self._lock:
+            counts = self._histograms.get(name)
+            if counts is None:
+                counts = self._histograms[name] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self._sums[name] = 0.0
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[name] += seconds
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        """Times the block; exceptions are counted as `<name>_errors` and re-raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{name}_errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name=None):
+        """Decorator form of timer(), named after the function by default."""
+        def decorator(func):
+            metric_name = name or func.__name__
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(metric_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def quantile(self, name, q):
+        """Estimates a latency quantile from the histogram (bucket upper bound)."""
+        with self._lock:
+            counts = list(self._histograms.get(name, ()))
+        total = sum(counts)
+        if not total: return None
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+            running += count
+            if running >= q * total:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        """Returns all metrics as a JSON-friendly dict."""
+        with self._lock:
+            names = list(self._histograms)
+            latencies = {name: {"count": sum(self._histograms[name]), "sum": self._sums[name]} for name in names}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name in names:
+            latencies[name]["p50"] = self.quantile(name, 0.50)
+            latencies[name]["p99"] = self.quantile(name, 0.99)
+        return {"ts": time.time(), "pid": os.getpid(), "latency": latencies,
+                "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        lines = [f"# TYPE {p}_latency_seconds histogram"]
+        with self._lock:
+            for name, counts in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, counts):
+                    cumulative += count
+                    lines.append(f'{p}_latency_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{p}_latency_seconds_bucket{{op="{name}",le="+Inf"}} {cumulative}')
+                lines.append(f'{p}_latency_seconds_sum{{op="{name}"}} {self._sums[name]}')
+                lines.append(f'{p}_latency_seconds_count{{op="{name}"}} {cumulative}')
+            lines.append(f"# TYPE {p}_events_total counter")
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'{p}_events_total{{event="{name}"}} {value}')
+            lines.append(f"# TYPE {p}_gauge gauge")
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f'{p}_gauge{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path, min_interval=0.0):
+        """Appends one snapshot line to a JSONL file, at most once per `min_interval` seconds."""
+        with self._lock:
+            now = time.time()
+            if now - self._last_jsonl_write < min_interval:
+                return
+            self._last_jsonl_write = now
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serves render_prometheus() at http://host:port/metrics on a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # Keep scrape requests out of the Streamlit log
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
@@ -0,0 +1,113 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from shared_store import open_cache_db
+
+
+class RateLimiter:
+    """Token buckets shared by all sessions of a process.
+
+    `limits` maps a limit name to (tokens per second, burst size); each
+    (limit, key) pair - e.g. ("ai_session", player_id) or ("ai_key", api_key) -
+    gets its own bucket, starting full. A rate of 0 or None means unlimited.
+    Idle buckets are dropped beyond `max_buckets` (least recently used first);
+    a dropped bucket simply starts full again.
+
+    Limits named in `shared` keep their buckets in the SQLite file at `path`
+    instead, so every worker process draws from the same tokens (keys are
+    stored hashed - they may be API keys).
+    """
+
+    def __init__(self, limits, max_buckets=50_000, shared=(), path=None):
+        self.limits = dict(limits)
+        self.max_buckets = max_buckets
+        self.shared = frozenset(shared)
+        self.rejected = 0
+        self.db_errors = 0 # Calls refused because the shared file stayed locked
+        self._buckets = OrderedDict() # (limit, key) -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.shared:
+            self._conn = open_cache_db(path, shared=True)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (name, key))"
+            )
+            self._conn.commit()
+
+    def allow(self, *buckets, cost=1.0, reserve=0.0, now=None):
+        """Takes `cost` tokens from every (limit, key) bucket, or from none of them.
+
+        Returns False (and takes nothing) if any bucket is short, so a click
+        rejected by the per-key limit doesn't also use up the session's tokens.
+        With `reserve`, buckets must keep that many tokens after the take:
+        background work uses it to leave the rest for interactive calls.
+        Also returns False if the shared file stays locked past the busy timeout.
+        """
+        local_now = time.monotonic() if now is None else now
+        shared_now = time.time() if now is None else now # Wall clock: comparable across processes
+        with self._lock:
+            states = []
+            shared_states = [] # (name, hashed key, state) to write back
+            try:
+                if self._conn is not None and any(limit in self.shared for limit, _ in buckets):
+                    # Locks the file for writing: other workers wait (busy timeout) until we commit
+                    self._conn.execute("BEGIN IMMEDIATE")
+                for limit, key in buckets:
+                    rate, burst = self.limits.get(limit) or (None, None)
+                    if not rate: continue # Unlimited
+                    if limit in self.shared:
+                        hashed = hashlib.sha256(str(key).encode("utf-8")).hexdigest()
+                        row = self._conn.execute(
+                            "SELECT tokens, updated_at FROM buckets WHERE name = ? AND key = ?", (limit, hashed)
+                        ).fetchone()
+                        state = list(row) if row else [float(burst), shared_now]
+                        state[0] = min(float(burst), state[0] + max(0.0, shared_now - state[1]) * rate)
+                        state[1] = shared_now
+                        shared_states.append((limit, hashed, state))
+                        states.append(state)
+                        continue
+                    state = self._buckets.get((limit, key))
+                    if state is None:
+                        state = self._buckets[(limit, key)] = [float(burst), local_now]
+                    self._buckets.move_to_end((limit, key))
+                    # Refill for the time since this bucket was last touched
+                    state[0] = min(float(burst), state[0] + (local_now - state[1]) * rate)
+                    state[1] = local_now
+                    states.append(state)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+
+                allowed = not any(state[0] < cost + reserve for state in states)
+                taken = cost if allowed else 0.0
+                if shared_states:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO buckets (name, key, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                        [(name, hashed, state[0] - taken, state[1]) for name, hashed, state in shared_states],
+                    )
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.commit()
+                # Only now charge this process's buckets, so a failed commit takes nothing
+                for state in states:
+                    state[0] -= taken
+            except sqlite3.OperationalError:
+                # Shared file still locked after the busy timeout: treat the call as rate limited
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+                self.db_errors += 1
+                allowed = False
+            except Exception:
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+            if not allowed:
+                self.rejected += 1
+            return allowed
+
+    def stats(self):
+        with self._lock:
+            return {"buckets": len(self._buckets), "rejected": self.rejected, "db_errors": self.db_errors}
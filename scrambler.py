@@ -0,0 +1,247 @@
+import hashlib
+import itertools
+import math
+import os
+import random
+import threading
+
+import numpy as np
+
+from lexicon import _FINAL_LETTERS, normalize_word
+from shared_store import file_lock, remove_stale
+
+# Candidate ranks: usable scrambles first, then ones that spell a real word
+# (used only when nothing else is left), then repeats and the word itself
+_USABLE, _REAL_WORD, _UNUSABLE = 0, 1, 2
+
+# Random odd multipliers for hashing scrambles (one per letter position; wraps mod 2**64)
+_HASH_MULTIPLIERS = np.random.default_rng(0).integers(1, 2**63, size=64, dtype=np.uint64) | np.uint64(1)
+_GROUP_SALT = np.uint64(0x9E3779B97F4A7C15) # Mixes an anagram group number into a hash key
+
+
+def scramble_difficulty(word, scrambled):
+    """Clues left in a scramble: letters still in place plus bigrams of the word kept intact.
+    Lower means harder to unscramble."""
+    fixed = sum(a == b for a, b in zip(word, scrambled))
+    bigrams = {word[i:i + 2] for i in range(len(word) - 1)}
+    kept = sum(scrambled[i:i + 2] in bigrams for i in range(len(scrambled) - 1))
+    return fixed + kept
+
+
+class ScrambleEngine:
+    """Precomputed scramble pools, ranked from easiest to hardest to unscramble.
+
+    All words of one length share a set of candidate letter orders (every
+    permutation for short words, a seeded sample for long ones), so pools are
+    scored for a whole length at a time with numpy: letters left in place plus
+    original bigrams kept (see scramble_difficulty). Scrambles that spell the
+    word itself or another known word are pushed out of the pool.
+
+    A pool is stored as permutation indices, not strings. draw() picks one
+    uniformly from a slice of the pool - low=0.0, high=0.5 is the easier half -
+    in O(1).
+
+    save() writes the pools of lexicon words as numpy arrays indexed by word
+    id; load_shared() builds them once for all workers and maps the files.
+    """
+
+    def __init__(self, words=(), real_words=None, candidates=64, seed=0, chunk_size=4096):
+        # real_words(word) -> known words with the same letters (e.g. AnagramIndex.anagrams)
+        self.real_words = real_words
+        self.candidates = candidates
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self._permutations = {} # length -> (m, length) array of candidate letter orders
+        self._pools = {} # word -> (order row: permutation indices easiest first, usable count, fallback count)
+        self._shared = None # (lexicon, word ids, order rows, counts) mapped by load_shared()
+        self._lock = threading.Lock()
+        self.add_words(words)
+
+    def __len__(self):
+        return len(self._pools) + (len(self._shared[1]) if self._shared is not None else 0)
+
+    def add_words(self, words):
+        """Builds pools for words not seen yet, one numpy batch per word length."""
+        by_length = {}
+        for word in dict.fromkeys(filter(None, map(normalize_word, words))):
+            if word not in self._pools and self._shared_entry(word) is None:
+                by_length.setdefault(len(word), []).append(word)
+        for length, batch in by_length.items():
+            for start in range(0, len(batch), self.chunk_size):
+                self._build(batch[start:start + self.chunk_size])
+
+    def pool(self, word):
+        """Returns all usable scrambles of the word, easiest first."""
+        word = normalize_word(word)
+        order, usable, _ = self._entry(word)
+        permutations = self._permutations_for(len(word))
+        return [self._spell(word, permutations[i]) for i in order[:usable]]
+
+    def draw(self, word, low=0.0, high=1.0, rng=random):
+        """Returns a random scramble from the [low, high) fraction of the word's pool."""
+        word = normalize_word(word)
+        order, usable, fallback = self._entry(word)
+        size = usable or fallback # No usable scramble left: accept one that spells a real word
+        if not size:
+            return word # Nothing to shuffle (one letter, or all letters the same)
+        start = min(int(low * size), size - 1)
+        stop = max(start + 1, min(size, math.ceil(high * size)))
+        return self._spell(word, self._permutations_for(len(word))[order[rng.randrange(start, stop)]])
+
+    def save(self, directory, lexicon):
+        """Writes the pools of words in `lexicon` as .npy files, sorted by word id (atomically).
+
+        ids.npy holds the word ids, order.npy one row of permutation indices per
+        word (padded to `candidates`), counts.npy the usable and fallback counts.
+        """
+        rows = sorted((word_id, entry) for word_id, entry in
+                      ((lexicon.index(word), entry) for word, entry in self._pools.items()) if word_id >= 0)
+        order = np.zeros((len(rows), self.candidates), dtype=np.uint16)
+        counts = np.zeros((len(rows), 2), dtype=np.uint16)
+        for row, (_, (word_order, usable, fallback)) in enumerate(rows):
+            order[row, :len(word_order)] = word_order
+            counts[row] = usable, fallback
+        temp_directory = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(temp_directory, exist_ok=True)
+        np.save(os.path.join(temp_directory, "ids.npy"), np.array([row[0] for row in rows], dtype=np.uint32))
+        np.save(os.path.join(temp_directory, "order.npy"), order)
+        np.save(os.path.join(temp_directory, "counts.npy"), counts)
+        os.rename(temp_directory, directory)
+
+    @classmethod
+    def load_shared(cls, words, lexicon, cache_dir, real_words=None, candidates=64, seed=0, chunk_size=4096):
+        """ScrambleEngine(words) for several worker processes: built once, then mapped by all.
+
+        `lexicon` must come from Lexicon.open() (e.g. Lexicon.load_shared) and
+        should contain `words`. The pools are keyed on the compiled lexicon file,
+        the words and the settings; the first worker to take the lock builds
+        and saves them, the others wait and np.load() the same files with
+        mmap_mode="r". Words outside the file still get a pool built on demand.
+        Pools saved for an older fingerprint are removed by the builder.
+        """
+        words = sorted(set(filter(None, map(normalize_word, words))))
+        fingerprint = hashlib.sha1("\n".join(
+            [repr((os.path.basename(lexicon.path), candidates, seed))] + words
+        ).encode("utf-8")).hexdigest()[:16]
+        directory = os.path.join(cache_dir, f"scrambles-{fingerprint}")
+        if not os.path.exists(directory):
+            with file_lock(directory + ".lock"):
+                if not os.path.exists(directory): # Not built while we waited for the lock
+                    cls(words, real_words, candidates, seed, chunk_size).save(directory, lexicon)
+                    remove_stale(cache_dir, "scrambles-", os.path.basename(directory)) # Older lexicons or words
+        engine = cls(real_words=real_words, candidates=candidates, seed=seed, chunk_size=chunk_size)
+        engine._shared = (lexicon,) + tuple(
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ("ids", "order", "counts")
+        )
+        return engine
+
+    def _entry(self, word):
+        entry = self._pools.get(word) or self._shared_entry(word)
+        if entry is None:
+            self.add_words([word]) # Word outside the precomputed list - build its pool now
+            entry = self._pools[word]
+        return entry
+
+    def _shared_entry(self, word):
+        if self._shared is None: return None
+        lexicon, ids, order, counts = self._shared
+        word_id = lexicon.index(word)
+        if word_id < 0: return None
+        row = int(np.searchsorted(ids, word_id))
+        if row == len(ids) or ids[row] != word_id: return None
+        usable, fallback = counts[row]
+        return order[row], int(usable), int(fallback)
+
+    @staticmethod
+    def _spell(word, permutation):
+        return "".join(word[i] for i in permutation)
+
+    def _permutations_for(self, length):
+        """The shared candidate letter orders for one word length (identity excluded).
+
+        Seeded per length, so every process draws the same orders whatever
+        lengths it sees first - pools saved by one worker index them in another.
+        """
+        with self._lock:
+            permutations = self._permutations.get(length)
+            if permutations is None:
+                rng = random.Random(f"{self.seed}:{length}")
+                identity = tuple(range(length))
+                if math.factorial(length) <= self.candidates + 1:
+                    orders = [p for p in itertools.permutations(identity) if p != identity]
+                else:
+                    seen = {identity}
+                    orders = []
+                    while len(orders) < self.candidates:
+                        order = tuple(rng.sample(identity, length))
+                        if order not in seen:
+                            seen.add(order)
+                            orders.append(order)
+                permutations = np.array(orders, dtype=np.intp).reshape(-1, length)
+                self._permutations[length] = permutations
+            return permutations
+
+    def _build(self, words):
+        """Scores every candidate scramble of same-length words at once and stores their pools."""
+        length = len(words[0])
+        permutations = self._permutations_for(length)
+        if not len(permutations):
+            with self._lock:
+                self._pools.update((word, (np.empty(0, np.uint16), 0, 0)) for word in words)
+            return
+
+        # (words, length) code points -> (words, candidates, length) scrambles. Letters are
+        # compared with finals folded, so "םימ" counts as the word "מים" itself.
+        text = "".join(words).translate(_FINAL_LETTERS)
+        letters = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).reshape(len(words), length)
+        scrambles = letters[:, permutations]
+        in_place = scrambles == letters[:, None, :]
+        fixed = in_place.sum(axis=2)
+        bigrams = letters[:, :-1].astype(np.uint64) << 32 | letters[:, 1:]
+        scrambled_bigrams = scrambles[:, :, :-1].astype(np.uint64) << 32 | scrambles[:, :, 1:]
+        kept = (scrambled_bigrams[:, :, :, None] == bigrams[:, None, None, :]).any(axis=3).sum(axis=2)
+        clues = fixed + kept
+
+        rank = np.where(in_place.all(axis=2), _UNUSABLE, _USABLE)
+        # Repeated letters make different orders spell the same scramble - keep the first only.
+        # Rows are hashed to one uint64 each, then duplicates are found by sorting every row at once.
+        keys = (scrambles.astype(np.uint64) * np.resize(_HASH_MULTIPLIERS, length)).sum(axis=2, dtype=np.uint64)
+        by_key = np.argsort(keys, axis=1, kind="stable")
+        sorted_keys = np.take_along_axis(keys, by_key, axis=1)
+        repeated = np.zeros(sorted_keys.shape, dtype=bool)
+        repeated[:, 1:] = sorted_keys[:, 1:] == sorted_keys[:, :-1]
+        duplicate = np.empty_like(repeated)
+        np.put_along_axis(duplicate, by_key, repeated, axis=1)
+        rank[duplicate] = _UNUSABLE
+        # Scrambles spelling another known word. Words with the same letters share their
+        # anagrams, so real_words() runs once per letter signature; the spellings are hashed
+        # like the candidates and salted with the signature's group, then one np.isin finds
+        # them. The word's own spelling matches only candidates already ranked unusable.
+        if self.real_words is not None:
+            signatures = (np.sort(letters, axis=1).astype(np.uint64) * np.resize(_HASH_MULTIPLIERS, length)).sum(
+                axis=1, dtype=np.uint64)
+            _, first_rows, groups = np.unique(signatures, return_index=True, return_inverse=True)
+            spellings, spelling_groups = [], []
+            for group, row in enumerate(first_rows):
+                known = [w for w in self.real_words(words[row]) if len(w) == length]
+                if len(known) > 1:
+                    spellings.extend(known)
+                    spelling_groups.extend([group] * len(known))
+            if spellings:
+                spelling_letters = np.frombuffer("".join(spellings).translate(_FINAL_LETTERS).encode("utf-32-le"),
+                                                 dtype=np.uint32).reshape(len(spellings), length)
+                spelling_keys = (spelling_letters.astype(np.uint64) * np.resize(_HASH_MULTIPLIERS, length)).sum(
+                    axis=1, dtype=np.uint64)
+                spells_real_word = np.isin(
+                    keys + groups.astype(np.uint64).reshape(-1, 1) * _GROUP_SALT,
+                    spelling_keys + np.array(spelling_groups, dtype=np.uint64) * _GROUP_SALT,
+                )
+                rank[spells_real_word & (rank == _USABLE)] = _REAL_WORD
+
+        # Easiest first within each rank: more clues sorts earlier
+        order = np.lexsort((-clues, rank), axis=1).astype(np.uint16)
+        usable = (rank == _USABLE).sum(axis=1)
+        fallback = (rank <= _REAL_WORD).sum(axis=1)
+        with self._lock:
+            for row, word in enumerate(words):
+                self._pools[word] = (order[row], int(usable[row]), int(fallback[row]))
@@ -0,0 +1,102 @@
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Not on POSIX: only single-worker mode is supported
+    fcntl = None
+
+# "single" (default): one Streamlit process owns its caches.
+# "multi": several workers behind a load balancer share one cache directory -
+# caches are read from disk instead of being copied into every process.
+DEPLOY_MODE = os.getenv("WORDGAME_DEPLOY_MODE", "single")
+MULTI_WORKER = DEPLOY_MODE == "multi"
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_BYTES = 256 << 20 # Reads come straight from the OS page cache, shared by all workers
+
+
+def open_cache_db(path, shared=MULTI_WORKER):
+    """Opens a cache database for all script threads of this process (callers hold a lock).
+
+    With `shared`, the database is set up for several processes at once: WAL
+    journal (readers never wait for the writer), a busy timeout instead of
+    "database is locked" errors, and memory-mapped reads.
+    """
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    if shared and path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL; a crash may lose the last commits only
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    return conn
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on `path` across processes (blocks until it is free)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def remove_stale(directory, prefix, keep):
+    """Deletes the files and directories in `directory` named `prefix`* other than
+    `keep` (and its lock file) - builds for an older fingerprint, never read again.
+    Temp files of builds still in progress are left alone."""
+    for name in os.listdir(directory):
+        if not name.startswith(prefix) or name.endswith(".tmp") or name in (keep, keep + ".lock"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            pass # Already removed by another worker
+
+
+class LeaderLock:
+    """Picks one process (the leader) among the workers sharing a cache directory.
+
+    try_acquire() takes a non-blocking lock and keeps it for the life of the
+    process; the OS releases it when the leader exits, so another worker can
+    take over on its next try.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        """Returns True if this process is (now) the leader."""
+        with self._lock:
+            if self._file is not None:
+                return True
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            f = open(self.path, "a")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    return False # Another worker leads
+            self._file = f
+            return True
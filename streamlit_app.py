@@ -1,56 +1,125 @@
 import streamlit as st
-import random
-import google.generativeai as genai
+import logging
 import os
 import time
+from functools import partial
+from game_state import GameState, is_player_id, new_player_id, open_score_store
+from gemini_client import FakeModel, GeminiClient, build_gemini_model
+from hint_bank import HintBank
+from levels import LevelEngine, load_level_config, load_word_artifact
+from metrics import Metrics
+from rate_limit import RateLimiter
+from scrambler import ScrambleEngine
+from shared_store import MULTI_WORKER, LeaderLock
+from lexicon import AnagramIndex, Lexicon
+from word_cache import (CACHE_DIR, VALIDITY_GENERATION_CONFIG, ValidityCache, build_validity_prompt,
+                        parse_validity_answer)
+from word_deck import draw_word
 
 # --- Configuration & Constants ---
 st.set_page_config(page_title="🌀 מילים מבולבלות לפי רמות 🌀", layout="wide", initial_sidebar_state="collapsed")
 
+# --- Instrumentation (latency histograms, error counts, cache hit rates) ---
+RERUN_STARTED_AT = time.perf_counter()
+METRICS_JSONL_PATH = os.getenv("WORDGAME_METRICS_JSONL") # Opt-in, like WORDGAME_METRICS_PORT
+METRICS_EXPORT_INTERVAL = 10.0 # Seconds between JSONL snapshots
+
+METRICS_PORT = os.getenv("WORDGAME_METRICS_PORT") # Serve /metrics for Prometheus on this port
+
+@st.cache_resource
+def get_metrics():
+    """One metrics registry per process."""
+    return Metrics()
+
+@st.cache_resource
+def get_metrics_leader():
+    """With several workers, only the one holding this lock serves /metrics (they share the port)."""
+    return LeaderLock(os.path.join(CACHE_DIR, "metrics-http.lock"))
+
+@st.cache_resource
+def start_metrics_server(port):
+    """Starts the /metrics endpoint once per process; a busy port is logged, not raised."""
+    try:
+        return get_metrics().start_http_server(port)
+    except OSError as e:
+        logging.getLogger(__name__).warning("metrics endpoint not started on port %s: %s", port, e)
+        return None
+
+metrics = get_metrics()
+if METRICS_PORT and get_metrics_leader().try_acquire():
+    start_metrics_server(int(METRICS_PORT))
+
 # --- Emojis ---
 EMOJI_THINKING = "🤔"; EMOJI_CORRECT = "✅"; EMOJI_WRONG = "❌"; EMOJI_HINT = "💡"
 EMOJI_NEW = "🔄"; EMOJI_REVEAL = "👀"; EMOJI_PARTY = "🎉"; EMOJI_NICE_TRY = "💪"
-EMOJI_BRAIN = "🧠"; EMOJI_STAR = "⭐"; EMOJI_WAIT = "⏳"; EMOJI_EASY = "😊"
-EMOJI_MEDIUM = "🙂"; EMOJI_HARD = "😎"; EMOJI_API_ERROR = "📡"
+EMOJI_BRAIN = "🧠"; EMOJI_STAR = "⭐"; EMOJI_WAIT = "⏳"; EMOJI_API_ERROR = "📡"
 
 # --- Word List & Level Definition ---
 HEBREW_WORDS_ALL = [
-    # Easy (3-4 letters)
-    "בית", "ספר", "ילד", "שמש", "ירח", "כדור", "פרח", "עץ", "מים", "אור", "יום",
-    "אבא", "אמא", "צבע", "גינה", "ים", "חול", "דלת", "אוכל", "כלב",
-    # Medium (5 letters)
-    "שלום", "ילדה", "חתול", "לילה", "משחק", "בלון", "עוגה", "מתנה", "כיסא", "שבוע",
-    "חודש", "חלון", "אהבה", "עבודה", "חופש", "טיול",
-    # Hard (6+ letters)
-    "שולחן", "מחשב", "ישראל", "כתיבה", "קריאה", "משפחה", "מדינה", "חבר"
+    # Short (2-3 letters)
+    "בית", "ספר", "ילד", "שמש", "ירח", "פרח", "עץ", "מים", "אור", "יום",
+    "אבא", "אמא", "צבע", "ים", "חול", "דלת", "כלב", "חבר",
+    # 4 letters
+    "כדור", "גינה", "אוכל", "שלום", "ילדה", "חתול", "לילה", "משחק", "בלון", "עוגה",
+    "מתנה", "כיסא", "שבוע", "חודש", "חלון", "אהבה", "חופש", "טיול", "מחשב",
+    # Long (5+ letters)
+    "עבודה", "שולחן", "ישראל", "כתיבה", "קריאה", "משפחה", "מדינה"
 ]
 
-# --- Process words into levels by length ---
-WORDS_BY_LEVEL = {
-    "קל": [],
-    "בינוני": [],
-    "קשה": []
-}
-LEVEL_DEFINITIONS = {
-    "קל": {"min": 3, "max": 4, "emoji": EMOJI_EASY},
-    "בינוני": {"min": 5, "max": 5, "emoji": EMOJI_MEDIUM},
-    "קשה": {"min": 6, "max": 10, "emoji": EMOJI_HARD}
-}
+# --- Process words into levels (rules live in levels.json) ---
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LEVEL_CONFIG = load_level_config()
+LEVEL_DEFINITIONS = {level["name"]: level for level in LEVEL_CONFIG["levels"]}
 LEVEL_NAMES = list(LEVEL_DEFINITIONS.keys())
 
-for word in HEBREW_WORDS_ALL:
-    length = len(word)
-    if LEVEL_DEFINITIONS["קל"]["min"] <= length <= LEVEL_DEFINITIONS["קל"]["max"]:
-        WORDS_BY_LEVEL["קל"].append(word)
-    elif LEVEL_DEFINITIONS["בינוני"]["min"] <= length <= LEVEL_DEFINITIONS["בינוני"]["max"]:
-        WORDS_BY_LEVEL["בינוני"].append(word)
-    elif LEVEL_DEFINITIONS["קשה"]["min"] <= length <= LEVEL_DEFINITIONS["קשה"]["max"]:
-        WORDS_BY_LEVEL["קשה"].append(word)
+# --- Hint Bank (pre-generated hints, shared by all sessions) ---
+@st.cache_resource
+def get_hint_bank():
+    """Hints per (word, level), filled ahead of time and kept on disk (read from disk by all workers in multi mode)."""
+    return HintBank(shared=MULTI_WORKER)
+
+hint_bank = get_hint_bank()
+
+# Curated artifact from curate_words.py; when present it replaces the inline word list
+WORDS_ARTIFACT_PATH = os.getenv("WORDGAME_WORDS_ARTIFACT", os.path.join(APP_DIR, "words.json.gz"))
+
+@st.cache_resource
+def get_word_artifact():
+    """Loads the curated word artifact once per process, or returns None if there isn't one.
+    Its pre-generated hints are copied into the hint bank and then dropped from the
+    cached artifact, so they are held once (by the bank), not twice."""
+    if not os.path.exists(WORDS_ARTIFACT_PATH):
+        return None
+    artifact = load_word_artifact(WORDS_ARTIFACT_PATH)
+    for level, hints_by_word in artifact.pop("hints", {}).items():
+        for word, hints in hints_by_word.items():
+            if not hint_bank.count(word, level):
+                hint_bank.add(word, level, hints)
+    return artifact
+
+word_artifact = get_word_artifact()
+
+@st.cache_resource
+def get_words_by_level():
+    """Buckets the corpus into levels once per process, reusing the on-disk index when fresh.
+    Returns (words_by_level, number of words that matched no level)."""
+    artifact = get_word_artifact()
+    if artifact is not None:
+        # Already curated and levelled offline - nothing to compute here
+        return {level: artifact["levels"].get(level, ()) for level in LEVEL_NAMES}, 0
+    engine = LevelEngine(LEVEL_CONFIG)
+    corpus_path = os.path.join(APP_DIR, LEVEL_CONFIG["corpus"]) if LEVEL_CONFIG.get("corpus") else None
+    words_by_level = engine.load_or_build(corpus_path, extra_words=HEBREW_WORDS_ALL)
+    return words_by_level, engine.dropped
+
+WORDS_BY_LEVEL, DROPPED_WORD_COUNT = get_words_by_level()
 
 # Check if levels have words
 for level, words in WORDS_BY_LEVEL.items():
     if not words:
         st.warning(f"שימו לב: לא נמצאו מילים לרמה '{level}' עם ההגדרות הנוכחיות.")
+if DROPPED_WORD_COUNT:
+    st.sidebar.caption(f"ℹ️ {DROPPED_WORD_COUNT} מילים לא מתאימות לאף רמה ב-levels.json ולא ייכללו במשחק.")
 
 # --- Gemini Model Setup (Sidebar) ---
 st.sidebar.header(f"{EMOJI_BRAIN} הגדרות עוזר ה-AI")
@@ -60,108 +129,265 @@ api_key_input = st.sidebar.text_input(
     help="אפשר להשיג מפתח בחינם מ-Google AI Studio כדי לקבל רמזים ובדיקת מילים.",
 )
 api_key = api_key_input or os.getenv("GOOGLE_API_KEY")
-model = None
+GEMINI_MODEL_NAME = 'gemini-1.5-flash' # Using a capable model, adjust if needed
+# Benchmarks and offline development can swap in a local fake model (see bench_app.py)
+fake_model_spec = os.getenv("WORDGAME_FAKE_MODEL")
+model_factory = None
 gemini_enabled = False
-if api_key:
-    try:
-        genai.configure(api_key=api_key)
-        # Using a capable model, adjust if needed
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        gemini_enabled = True
-        st.sidebar.success(f"{EMOJI_CORRECT} עוזר ה-AI מוכן!")
-    except Exception as e:
-        st.sidebar.error(f"⚠️ שגיאה בהגדרת עוזר ה-AI: {e}")
-        st.sidebar.caption("ייתכן שהמפתח שגוי או שיש בעיית רשת.")
+
+@st.cache_resource
+def get_fake_model(spec):
+    """One shared fake per process, like the real client (keeps its RNG and call count)."""
+    return FakeModel.from_spec(spec)
+
+if fake_model_spec is not None:
+    fake_model = get_fake_model(fake_model_spec)
+    model_factory = lambda: fake_model
+    api_key = f"fake:{fake_model_spec}" # Keys the shared client cache
+    gemini_enabled = True
+    st.sidebar.success(f"{EMOJI_CORRECT} עוזר AI מקומי (מדומה) פעיל")
+elif api_key:
+    # The SDK is imported and the model built only when an AI feature is first used
+    model_factory = partial(build_gemini_model, api_key, GEMINI_MODEL_NAME)
+    gemini_enabled = True
+    st.sidebar.success(f"{EMOJI_CORRECT} עוזר ה-AI מוכן!")
 elif not api_key:
     st.sidebar.info("ℹ️ אפשר לשחק גם בלי מפתח API, אבל לא יהיו רמזים או בדיקת מילים מיוחדת מה-AI.")
 
+# --- Shared Gemini Client (non-blocking pool, coalesces duplicate requests) ---
+@st.cache_resource(max_entries=8, on_release=lambda client: client.close()) # Every key typed in the sidebar gets a client
+def get_gemini_client(api_key, model_name, _model_factory):
+    """One client (and one model) per (API key, model name), shared by all sessions and reruns.
+    Identical in-flight prompts share one call."""
+    return GeminiClient(model_factory=_model_factory, max_concurrency=4, timeout=10, retries=2)
+
+gemini_client = get_gemini_client(api_key, GEMINI_MODEL_NAME, model_factory) if gemini_enabled else None
+
+@st.cache_resource
+def get_prefill_leader():
+    """With several workers, only the one holding this lock runs the hint prefill."""
+    return LeaderLock(os.path.join(CACHE_DIR, "hint-prefill.lock"))
+
+@st.cache_resource(max_entries=8)
+def start_hint_prefill(api_key, model_name, _model_factory, _limiter):
+    """Starts the background batch job that fills the hint bank (once per process and key).
+    Every batch call takes a token from the key's bucket, but only while more than
+    PREFILL_RESERVE tokens are left - the rest is kept for players' own clicks.
+    The client is looked up per call: get_gemini_client may have closed and rebuilt it since."""
+    def generate(prompt):
+        while not _limiter.allow(("ai_key", api_key), reserve=PREFILL_RESERVE):
+            time.sleep(PREFILL_BACKOFF)
+        client = get_gemini_client(api_key, model_name, _model_factory)
+        # Many words per call - allow more time
+        response = client.generate(prompt, generation_config={'temperature': 0.7}, timeout=60)
+        return response.text if response.parts else None
+    return get_hint_bank().start_prefill(WORDS_BY_LEVEL, generate)
+
+# --- Shared Caches (one per process, shared by all sessions) ---
+@st.cache_resource
+def get_validity_cache():
+    """Disk-backed yes/no cache of Gemini validity verdicts, survives restarts.
+    In multi-worker mode there is no per-process copy: all workers read the shared table."""
+    return ValidityCache(max_memory_entries=0 if MULTI_WORKER else 5000)
+
+validity_cache = get_validity_cache()
+
+LEXICON_PATH = os.path.join(APP_DIR, "hebrew_words.txt")
+
+@st.cache_resource
+def get_lexicon():
+    """Offline word list (hebrew_words.txt + the game words), loaded once per process."""
+    game_words = [word for words in WORDS_BY_LEVEL.values() for word in words]
+    if MULTI_WORKER:
+        # Compiled once by the first worker, then memory-mapped (not copied) by every worker
+        return Lexicon.load_shared(LEXICON_PATH, HEBREW_WORDS_ALL + game_words, CACHE_DIR)
+    return Lexicon.from_file(LEXICON_PATH, extra_words=HEBREW_WORDS_ALL + game_words)
+
+lexicon = get_lexicon()
+GameState.words = lexicon # Game states keep word ids; this turns them back into words
+
+@st.cache_resource
+def get_anagram_index():
+    """Sorted-letters -> known words, built once over the lexicon (read from the
+    compiled lexicon file in multi-worker mode)."""
+    return AnagramIndex(get_lexicon())
+
+anagram_index = get_anagram_index()
+
+@st.cache_resource
+def get_scramble_engine():
+    """Ranked scramble pools for every game word, precomputed once per process."""
+    game_words = [word for words in WORDS_BY_LEVEL.values() for word in words]
+    if MULTI_WORKER:
+        # Built once by the first worker, then memory-mapped (not copied) by every worker
+        return ScrambleEngine.load_shared(game_words, get_lexicon(), CACHE_DIR,
+                                          real_words=get_anagram_index().anagrams)
+    return ScrambleEngine(game_words, real_words=get_anagram_index().anagrams)
+
+scramble_engine = get_scramble_engine()
+
+# --- Score Store (scores and streaks outlive the browser session) ---
+SCORE_STORE_KIND = os.getenv("WORDGAME_SCORE_STORE", "sqlite") # "sqlite", "memory" or "none"
+
+@st.cache_resource
+def get_score_store(kind):
+    """Per-player level, score and streak, keyed by the ?player= id in the page URL."""
+    return open_score_store(kind)
+
+score_store = get_score_store(SCORE_STORE_KIND)
+
+# --- Rate Limits (token buckets shared by all sessions of this process) ---
+# Clicks: server-side debounce per session. Gemini: per session and per API key, checked before
+# any network work - players over the limit get a cached or local-only answer instead.
+CLICK_RATE = float(os.getenv("WORDGAME_CLICK_RATE", "1.0")) # Clicks per second per session, 0 = unlimited
+
+@st.cache_resource
+def get_rate_limiter(click_rate):
+    """One set of buckets per process: (tokens per second, burst) for each limit.
+    In multi-worker mode the per-key buckets live in the cache directory, so the
+    key's limit holds across all workers; sessions stay on one worker, so theirs stay local."""
+    return RateLimiter({
+        "clicks": (click_rate, 3), # Double-clicks and quick retries are fine, button mashing isn't
+        "ai_session": (10 / 60, 5), # 10 Gemini calls a minute per player
+        "ai_key": (120 / 60, 30), # 120 a minute per API key, across all players
+    }, shared=("ai_key",) if MULTI_WORKER else (), path=os.path.join(CACHE_DIR, "rate_limits.sqlite3"))
+
+rate_limiter = get_rate_limiter(CLICK_RATE)
+PREFILL_RESERVE = 15 # ai_key tokens the background hint prefill never touches
+PREFILL_BACKOFF = 2.0 # Seconds the prefill waits when only the reserve is left
+
 # --- Helper Functions ---
 
-def scramble_word(word):
-    """Scrambles the letters of a given word, ensuring it's different."""
+def record_rerun():
+    """Records this rerun's latency and cache hit rates; exports a JSONL snapshot every few seconds
+    if WORDGAME_METRICS_JSONL is set.
+    Called at the end of the script and right before st.rerun() (which skips the end)."""
+    metrics.observe("rerun", time.perf_counter() - RERUN_STARTED_AT)
+    metrics.set_gauge("validity_cache_hit_rate", validity_cache.stats()["hit_rate"])
+    if gemini_client:
+        client_stats = gemini_client.stats()
+        metrics.set_gauge("gemini_upstream_calls", client_stats["upstream_calls"])
+        metrics.set_gauge("gemini_coalesced_calls", client_stats["coalesced_calls"])
+    if not METRICS_JSONL_PATH:
+        return
+    try:
+        metrics.write_jsonl(METRICS_JSONL_PATH, min_interval=METRICS_EXPORT_INTERVAL)
+    except OSError:
+        pass # Metrics must never break the game
+
+@metrics.timed()
+def scramble_word(word, level):
+    """Scrambles the letters of a given word - never into the word itself or another real word.
+    The level's scramble_range picks the slice of the ranked pool: easier levels leave more clues."""
     if not word: return ""
-    char_list = list(word)
-    # Shuffle at least once
-    random.shuffle(char_list)
-    scrambled = "".join(char_list)
-    # Re-shuffle if identical (for words > 1 letter) up to a limit
-    attempts = 0
-    max_attempts = 5
-    while scrambled == word and len(word) > 1 and attempts < max_attempts:
-        random.shuffle(char_list)
-        scrambled = "".join(char_list)
-        attempts += 1
-    return scrambled
+    low, high = LEVEL_DEFINITIONS[level].get("scramble_range") or (0.0, 1.0)
+    return scramble_engine.draw(word, low, high)
 
+@metrics.timed()
 def get_new_word():
-    """Selects a new word based on the current level and resets game state."""
-    current_level = st.session_state.current_level
-    word_list = WORDS_BY_LEVEL.get(current_level, [])
+    """Selects a new word based on the current level and resets the round."""
+    game = st.session_state.game
+    word_list = WORDS_BY_LEVEL.get(game.level, [])
 
     if not word_list:
-        st.error(f"אוי לא! אין מילים ברמה '{current_level}'. נסו לבחור רמה אחרת.")
+        st.error(f"אוי לא! אין מילים ברמה '{game.level}'. נסו לבחור רמה אחרת.")
         st.stop() # Stop execution if no words available for the level
         return
 
-    original_word = random.choice(word_list)
-    # Ensure the new word isn't the same as the last one if possible
-    max_tries = 3
-    tries = 0
-    while original_word == st.session_state.get('original_word') and len(word_list) > 1 and tries < max_tries:
-        original_word = random.choice(word_list)
-        tries += 1
-
-    st.session_state.original_word = original_word
-    st.session_state.scrambled_word = scramble_word(original_word)
+    # Each session walks a shuffled deck per level: no repeats until the deck runs out.
+    # The cursor is only (seed, position) - the word list itself is shared, never copied.
+    original_word, game.deck_cursors[game.level] = draw_word(
+        word_list,
+        game.deck_cursors.get(game.level),
+        avoid=game.word, # Don't repeat the last word across passes
+    )
 
-    # Clear only relevant game state - NOT user_guess or level or score/streak
-    if 'message' in st.session_state: del st.session_state.message
-    if 'message_type' in st.session_state: del st.session_state.message_type
-    if 'hint' in st.session_state: del st.session_state.hint
-    if 'hint_for_word' in st.session_state: del st.session_state.hint_for_word
+    # Clears message and hint too - NOT user_guess or level or score/streak
+    game.start_word(lexicon.index(original_word), scramble_word(original_word, game.level))
 
 # --- Gemini Helper Functions ---
 
+def allow_gemini_call():
+    """Takes one token from this player's and this API key's Gemini buckets. False if either is empty."""
+    return rate_limiter.allow(("ai_session", st.session_state.game.player_id), ("ai_key", api_key))
+
+@metrics.timed()
 def check_word_validity_gemini(word_to_check):
     """Uses Gemini to check if a word is a valid Hebrew word. Returns True, False, or None."""
-    if not model or not gemini_enabled:
+    # Common mistakes repeat across kids - answer from the shared cache when possible
+    cached_verdict = validity_cache.get(word_to_check)
+    if cached_verdict is not None:
+        return cached_verdict
+
+    if not gemini_client or not gemini_enabled:
         return None # Cannot perform check
 
-    # Simple prompt focused on getting a clear yes/no
-    prompt = f"האם '{word_to_check}' היא מילה תקינה ונפוצה בשפה העברית המודרנית? ענה רק 'כן' או 'לא'."
+    # Over the rate limit: no call - the caller falls back to a local-only answer
+    if not allow_gemini_call():
+        metrics.increment("gemini_validity_rate_limited")
+        return None
+
+    # Simple prompt focused on getting a clear yes/no (shared with batch checks)
+    prompt = build_validity_prompt(word_to_check)
     try:
-        # Configure for deterministic answer, shorter timeout might be useful
-        response = model.generate_content(
+        # Deterministic answer (temperature 0); kids guessing the same word share one call
+        response = gemini_client.generate(
             prompt,
-            generation_config=genai.types.GenerationConfig(
-                candidate_count=1,
-                temperature=0.0 # Minimal temperature
-            ),
-            request_options={'timeout': 10} # 10 second timeout
+            generation_config=VALIDITY_GENERATION_CONFIG,
+            timeout=10, # 10 second timeout per attempt
+            deadline=12 # Stop waiting (but let the call finish for others) after this
             # Consider stricter safety if needed, but often causes issues with simple word checks
             # safety_settings={'HARASSMENT':'block_none', ...}
         )
         if response.parts:
             answer = response.text.strip().lower()
             # Check explicitly for 'כן' or 'לא' at the start for robustness
-            if answer.startswith("כן"): return True
-            if answer.startswith("לא"): return False
+            verdict = parse_validity_answer(answer)
+            if verdict is not None:
+                validity_cache.put(word_to_check, verdict)
+                return verdict
+            metrics.increment("gemini_validity_unclear")
             st.sidebar.warning(f"Gemini (validity): תשובה לא ברורה '{answer}'")
             return None # Unclear answer
         else:
             reason = getattr(response.prompt_feedback, 'block_reason', 'Unknown')
+            metrics.increment("gemini_validity_blocked")
             st.sidebar.warning(f"Gemini (validity): הבקשה נחסמה ({reason})")
             return None # Blocked or empty response
     except Exception as e:
+        metrics.increment("gemini_validity_errors")
         st.sidebar.error(f"Gemini (validity) Error: {e}")
         return None # Error during API call
 
+@metrics.timed()
 def get_hint_gemini(word_to_hint):
-    """Uses Gemini to generate a hint for the word. Returns hint text or error string."""
-    if not model or not gemini_enabled:
+    """Returns a hint for the word: from the hint bank if possible, else from Gemini.
+    Returns hint text or error string."""
+    game = st.session_state.game
+    current_level = game.level
+
+    # Pre-generated hints are an instant local read - Gemini is only for cold misses
+    banked_hint = hint_bank.next_hint(word_to_hint, current_level)
+    metrics.increment("hint_bank_hits" if banked_hint else "hint_bank_misses")
+    if banked_hint:
+        game.set_hint(banked_hint, lexicon.index(word_to_hint))
+        return banked_hint
+
+    if not gemini_client or not gemini_enabled:
         return f"{EMOJI_API_ERROR} עוזר ה-AI לא זמין כרגע."
 
-    current_level = st.session_state.get('current_level', 'לא ידועה')
+    # Over the rate limit: answer locally instead of calling Gemini
+    if not allow_gemini_call():
+        metrics.increment("gemini_hint_rate_limited")
+        local_hint = f"המילה מתחילה באות '{word_to_hint[0]}'."
+        game.set_hint(local_hint, lexicon.index(word_to_hint))
+        return local_hint
+
+    # First cold miss: start filling the bank in the background for everyone
+    # (one worker does it for all when several share the cache directory)
+    if get_prefill_leader().try_acquire():
+        start_hint_prefill(api_key, GEMINI_MODEL_NAME, model_factory, rate_limiter)
+
     # Prompt tailored for kids and level awareness
     prompt = f"""
 אני ילד/ה שמשחק/ת במשחק ניחוש מילים בעברית ברמה '{current_level}'.
@@ -173,12 +399,13 @@ def get_hint_gemini(word_to_hint):
 למילה 'מחשב' ברמה קשה, רמז טוב יהיה: 'מכשיר עם מסך ומקלדת שעוזר לנו ללמוד ולשחק'.
 """
     try:
-        response = model.generate_content(
+        response = gemini_client.generate(
              prompt,
-             generation_config=genai.types.GenerationConfig(
-                 temperature=0.7 # Allow some creativity for hints
-             ),
-             request_options={'timeout': 15}, # Slightly longer timeout for generation
+             generation_config={
+                 'temperature': 0.7 # Allow some creativity for hints
+             },
+             timeout=15, # Slightly longer timeout for generation
+             deadline=18,
              # Safety settings might be needed depending on words/hints generated
              # safety_settings={'HARASSMENT':'block_none', ...}
         )
@@ -186,51 +413,52 @@ def get_hint_gemini(word_to_hint):
              hint_text = response.text.strip().replace("*","") # Remove markdown emphasis sometimes added
              # Basic validation: Check if hint is not too short or empty
              if hint_text and len(hint_text) > 3:
-                 st.session_state.hint = hint_text
-                 st.session_state.hint_for_word = word_to_hint # Track which word the hint is for
+                 game.set_hint(hint_text, lexicon.index(word_to_hint)) # Track which word the hint is for
+                 hint_bank.add(word_to_hint, current_level, [hint_text]) # Next kid gets it instantly
                  return hint_text
              else:
+                 metrics.increment("gemini_hint_short")
                  st.sidebar.warning(f"Gemini (hint): Received short/empty hint: '{hint_text}'")
                  return f"{EMOJI_THINKING} הממ... לא הצלחתי לחשוב על רמז טוב הפעם."
         else:
             reason = getattr(response.prompt_feedback, 'block_reason', 'Unknown')
+            metrics.increment("gemini_hint_blocked")
             st.sidebar.warning(f"Gemini (hint): הבקשה נחסמה ({reason})")
             return f"{EMOJI_BRAIN} לא ניתן היה ליצור רמז (אולי נחסם)."
 
     except Exception as e:
+        metrics.increment("gemini_hint_errors")
         st.sidebar.error(f"Gemini (hint) Error: {e}")
         return f"{EMOJI_API_ERROR} שגיאה ביצירת רמז מהעוזר."
 
 # --- Initialize Session State ---
-if 'current_level' not in st.session_state:
-    st.session_state.current_level = LEVEL_NAMES[0]
-if 'original_word' not in st.session_state:
-    # Must call get_new_word *after* current_level is set
+# One compact GameState per session, plus the widget keys (user_guess, level_selector)
+if 'game' not in st.session_state:
+    # The player id in the URL lets a returning (or evicted) session pick up its score again
+    player_id = st.query_params.get("player")
+    if not is_player_id(player_id):
+        player_id = new_player_id()
+        st.query_params["player"] = player_id
+    game = GameState(player_id, LEVEL_NAMES[0])
+    game.restore(score_store.load(player_id) if score_store else None, LEVEL_NAMES)
+    st.session_state.game = game
+    # Must call get_new_word *after* the game (and its level) exists
     get_new_word()
-if 'last_btn_press' not in st.session_state:
-    st.session_state.last_btn_press = 0
-if 'score' not in st.session_state:
-    st.session_state.score = 0
-if 'streak' not in st.session_state:
-    st.session_state.streak = 0
+game = st.session_state.game
 if 'level_selector' not in st.session_state:
-     st.session_state.level_selector = st.session_state.current_level
+     st.session_state.level_selector = game.level
 
 # --- Callback for Level Change ---
 def handle_level_change():
     """Called when the level selection radio button changes."""
+    game = st.session_state.game
     new_level = st.session_state.level_selector # Get value from the widget's key
-    if new_level != st.session_state.current_level: # Check if level actually changed
-        st.session_state.current_level = new_level
-        st.session_state.streak = 0 # Reset streak
+    if new_level != game.level: # Check if level actually changed
+        game.level = new_level
+        game.streak = 0 # Reset streak
         st.toast(f"עוברים לרמה {new_level}! {LEVEL_DEFINITIONS[new_level]['emoji']}", icon="🚀")
-        get_new_word() # Fetch a word for the new level
-        # Clear user input and other game state messages/hints
-        if "user_guess" in st.session_state: del st.session_state.user_guess
-        if 'message' in st.session_state: del st.session_state.message
-        if 'message_type' in st.session_state: del st.session_state.message_type
-        if 'hint' in st.session_state: del st.session_state.hint
-        if 'hint_for_word' in st.session_state: del st.session_state.hint_for_word
+        get_new_word() # Fetch a word for the new level (clears message and hint)
+        st.session_state.pop("user_guess", None) # Clear user input
     # No st.rerun() needed here, Streamlit handles rerun after callback completes
 
 # --- Main App Layout ---
@@ -240,9 +468,9 @@ st.divider()
 col_game, col_info = st.columns([2.5, 1]) # Game area wider
 
 with col_game:
-    st.subheader(f"סידור אותיות - רמה: {st.session_state.current_level} {LEVEL_DEFINITIONS[st.session_state.current_level]['emoji']}")
+    st.subheader(f"סידור אותיות - רמה: {game.level} {LEVEL_DEFINITIONS[game.level]['emoji']}")
     # Scrambled Word Display - Big and Colorful
-    scrambled_html = f"<h1 style='text-align: center; color: #0068C9; font-weight: bold; letter-spacing: 5px; margin-bottom: 15px;'>{st.session_state.scrambled_word}</h1>"
+    scrambled_html = f"<h1 style='text-align: center; color: #0068C9; font-weight: bold; letter-spacing: 5px; margin-bottom: 15px;'>{game.scrambled}</h1>"
     st.markdown(scrambled_html, unsafe_allow_html=True)
 
     # User Input
@@ -257,8 +485,8 @@ with col_game:
     # Hint Area - Placeholder for dynamic content
     hint_area = st.empty()
     # Display hint ONLY if it exists in state AND is for the CURRENT word
-    if 'hint' in st.session_state and st.session_state.get('hint_for_word') == st.session_state.get('original_word'):
-         hint_area.info(f"{EMOJI_HINT} רמז: {st.session_state.hint}")
+    if game.has_hint:
+         hint_area.info(f"{EMOJI_HINT} רמז: {game.hint}")
 
     # Feedback Area - Placeholder for dynamic content
     feedback_area = st.empty()
@@ -274,133 +502,129 @@ with col_info:
         horizontal=True, # Display side-by-side
         label_visibility="collapsed" # Hide the default label
     )
-    st.caption(f"קל: {LEVEL_DEFINITIONS['קל']['min']}-{LEVEL_DEFINITIONS['קל']['max']} | "
-               f"בינוני: {LEVEL_DEFINITIONS['בינוני']['min']} | "
-               f"קשה: {LEVEL_DEFINITIONS['קשה']['min']}+ אותיות")
     st.divider()
 
     # Score Display
     st.subheader("הניקוד שלי")
-    st.metric(label=f"{EMOJI_STAR} סך הכל נקודות", value=st.session_state.score)
-    st.metric(label="🔥 רצף הצלחות", value=st.session_state.streak)
+    st.metric(label=f"{EMOJI_STAR} סך הכל נקודות", value=game.score)
+    st.metric(label="🔥 רצף הצלחות", value=game.streak)
     st.divider()
 
     # Action Buttons
     st.subheader("פעולות")
-    MIN_CLICK_INTERVAL = 1.0 # Debounce interval in seconds
-    # Check if enough time has passed since the last button press
-    can_process_click = time.time() - st.session_state.last_btn_press > MIN_CLICK_INTERVAL
 
     # Button definitions with disabling logic
-    check_button = st.button(f"{EMOJI_CORRECT} בדוק!", use_container_width=True, type="primary", disabled=not can_process_click or not st.session_state.get("user_guess"))
-    hint_button = st.button(f"{EMOJI_HINT} אפשר רמז?", use_container_width=True, disabled=not gemini_enabled or not can_process_click)
-    reveal_button = st.button(f"{EMOJI_REVEAL} גיליתי...", use_container_width=True, disabled=not can_process_click)
-    new_word_button = st.button(f"{EMOJI_NEW} מילה אחרת (באותה רמה)", use_container_width=True, disabled=not can_process_click)
-
-    # Show wait message if buttons are temporarily disabled
+    check_button = st.button(f"{EMOJI_CORRECT} בדוק!", use_container_width=True, type="primary", disabled=not st.session_state.get("user_guess"))
+    # Banked hints work even without an API key
+    hint_available = gemini_enabled or hint_bank.has_hints(game.word, game.level)
+    hint_button = st.button(f"{EMOJI_HINT} אפשר רמז?", use_container_width=True, disabled=not hint_available)
+    reveal_button = st.button(f"{EMOJI_REVEAL} גיליתי...", use_container_width=True)
+    new_word_button = st.button(f"{EMOJI_NEW} מילה אחרת (באותה רמה)", use_container_width=True)
+
+    # Debounce on the server: every click takes a token from this player's click bucket
+    clicked = check_button or hint_button or reveal_button or new_word_button
+    can_process_click = not clicked or rate_limiter.allow(("clicks", game.player_id))
+    # Show wait message if a click came too fast and was ignored
     if not can_process_click:
+        metrics.increment("clicks_rate_limited")
         st.caption(f"{EMOJI_WAIT} רק שניה...")
 
 # --- Game Logic --- Executes based on button presses if debounce allows ---
 
-current_time = time.time() # Get current time once for efficiency
-
-# Process button clicks only if debounce interval has passed
+# Process button clicks only if the click bucket had a token left
 if can_process_click:
 
     # --- Check Answer Logic ---
     if check_button and guess: # Ensure guess has content
-        st.session_state.last_btn_press = current_time # Record press time
         cleaned_guess = guess.strip()
+        original_word = game.word
+
+        # Correct Guess Branch - the original word or any other real word from the same letters
+        if (cleaned_guess == original_word
+                or anagram_index.is_anagram_word(cleaned_guess, original_word)):
+            game.score += 1
+            game.streak += 1
+            if cleaned_guess == original_word:
+                success_message = f"{EMOJI_PARTY} יש! כל הכבוד! המילה היא '{original_word}'. קבלו מילה חדשה!"
+            else:
+                success_message = (f"{EMOJI_PARTY} יש! גם '{cleaned_guess}' היא מילה מהאותיות האלה "
+                                   f"(חשבנו על '{original_word}'). קבלו מילה חדשה!")
 
-        # Correct Guess Branch
-        if cleaned_guess == st.session_state.original_word:
-            st.session_state.score += 1
-            st.session_state.streak += 1
-            st.balloons() # Fun celebration!
-            st.session_state.message = f"{EMOJI_PARTY} יש! כל הכבוד! המילה היא '{st.session_state.original_word}'. קבלו מילה חדשה!"
-            st.session_state.message_type = "success"
-            feedback_area.success(st.session_state.message) # Show immediate feedback
-            hint_area.empty() # Clear any old hint
-            st.toast(f"מעולה! +1 נקודה {EMOJI_STAR}", icon=EMOJI_PARTY)
-            time.sleep(2) # Pause to show message/balloons
+            get_new_word() # Prepare next word right away - no server-side pause
 
-            get_new_word() # Prepare next word state
+            # The celebration runs client-side on the next rerun, next to the new word
+            game.set_message(success_message, "success")
+            game.celebrate = True
 
             # CRITICAL: Clear input widget state *before* rerun
-            if "user_guess" in st.session_state:
-                del st.session_state.user_guess
+            st.session_state.pop("user_guess", None)
 
+            game.save(score_store)
+            record_rerun()
             st.rerun() # Trigger rerun to display new word and clear input
 
         # Incorrect Guess Branch
         else:
-            st.session_state.streak = 0 # Reset streak
-            st.session_state.user_guess = cleaned_guess # Keep wrong guess in box for editing
+            game.streak = 0 # Reset streak
+            # Wrong guess stays in the box for editing (the widget keeps its own value;
+            # assigning to its key after instantiation raises in Streamlit)
             validity_check_result = None
             validity_message = ""
-            if gemini_enabled:
+            if cleaned_guess in lexicon:
+                validity_check_result = True # Known word - answered locally, no Gemini call
+                metrics.increment("validity_lexicon_hits")
+            elif gemini_enabled:
                 with st.spinner(f"{EMOJI_THINKING} המממ... בודק אם המילה קיימת..."):
                     validity_check_result = check_word_validity_gemini(cleaned_guess)
 
             # Tailor feedback based on validity check
             if validity_check_result is True:
                 validity_message = f"'{cleaned_guess}' זו מילה, אבל לא זו שחיפשנו."
-                st.session_state.message = f"אופס... {validity_message} נסו שוב! {EMOJI_NICE_TRY}"
-                st.session_state.message_type = "warning"
+                game.set_message(f"אופס... {validity_message} נסו שוב! {EMOJI_NICE_TRY}", "warning")
             elif validity_check_result is False:
                  validity_message = f"לא בטוח ש-' {cleaned_guess}' זו מילה קיימת..."
-                 st.session_state.message = f"הו לא... {validity_message} בואו ננסה שוב! {EMOJI_NICE_TRY}"
-                 st.session_state.message_type = "error"
+                 game.set_message(f"הו לא... {validity_message} בואו ננסה שוב! {EMOJI_NICE_TRY}", "error")
             else: # Gemini disabled or check failed
-                 st.session_state.message = f"לא נכון... {EMOJI_THINKING} נסו שוב, אתם יכולים!"
-                 st.session_state.message_type = "error"
+                 game.set_message(f"לא נכון... {EMOJI_THINKING} נסו שוב, אתם יכולים!", "error")
             # No rerun here, just update feedback message state for display later
 
     # --- Get Hint Logic ---
-    elif hint_button and gemini_enabled:
-        st.session_state.last_btn_press = current_time
-        current_word = st.session_state.original_word
+    elif hint_button and hint_available:
+        current_word = game.word
 
         # Only fetch hint if we don't have one for the *current* word
-        if st.session_state.get('hint_for_word') != current_word:
+        if not game.has_hint:
             with st.spinner(f"{EMOJI_BRAIN} חושב על רמז טוב..."):
                 hint_text = get_hint_gemini(current_word) # This updates state on success
 
             # Check if hint generation was successful (updates state) or returned an error message
-            if 'hint' in st.session_state and st.session_state.hint_for_word == current_word:
+            if game.has_hint:
                  # Successfully got and stored hint - clear other messages
-                 if 'message' in st.session_state: del st.session_state.message
-                 if 'message_type' in st.session_state: del st.session_state.message_type
+                 game.clear_feedback()
                  feedback_area.empty() # Clear previous feedback
                  st.toast("קיבלת רמז!", icon=EMOJI_HINT)
                  # No rerun needed, display logic will pick up the new hint
             else:
                 # Hint generation failed or returned error message
-                st.session_state.message = hint_text # Display the error message
-                st.session_state.message_type = "warning"
+                game.set_message(hint_text, "warning") # Display the error message
         else:
              # Hint already exists for this word
-             if 'message' in st.session_state: del st.session_state.message
-             if 'message_type' in st.session_state: del st.session_state.message_type
+             game.clear_feedback()
              feedback_area.empty() # Clear other messages
              st.toast("הרמז כבר מוצג!", icon="👇")
              # No rerun needed
 
     # --- Reveal Answer Logic ---
     elif reveal_button:
-        st.session_state.last_btn_press = current_time
-        st.session_state.streak = 0 # Reset streak
-        st.session_state.message = f"{EMOJI_REVEAL} המילה היתה: **{st.session_state.original_word}**. לא נורא, נסו את הבאה!"
-        st.session_state.message_type = "info"
+        game.streak = 0 # Reset streak
+        game.set_message(f"{EMOJI_REVEAL} המילה היתה: **{game.word}**. לא נורא, נסו את הבאה!", "info")
         hint_area.empty() # Clear any hint display
         # No rerun needed, feedback will update
 
     # --- Get New Word (Manual Button Request) ---
     elif new_word_button:
-        st.session_state.last_btn_press = current_time
-        st.session_state.streak = 0 # Reset streak for skipping
-        st.toast(f"טוען מילה חדשה ברמה '{st.session_state.current_level}'... {EMOJI_NEW}", icon=EMOJI_WAIT)
+        game.streak = 0 # Reset streak for skipping
+        st.toast(f"טוען מילה חדשה ברמה '{game.level}'... {EMOJI_NEW}", icon=EMOJI_WAIT)
 
         get_new_word() # Prepare next word state for the current level
 
@@ -408,25 +632,41 @@ if can_process_click:
         feedback_area.empty() # Clear previous feedback
 
         # CRITICAL: Clear input widget state *before* rerun
-        if "user_guess" in st.session_state:
-             del st.session_state.user_guess
+        st.session_state.pop("user_guess", None)
 
+        game.save(score_store)
+        record_rerun()
         st.rerun() # Trigger rerun to display new word and clear input
 
+# --- Celebration (one rerun after a correct guess; animations play in the browser) ---
+if game.celebrate:
+    game.celebrate = False
+    st.balloons() # Fun celebration!
+    st.toast(f"מעולה! +1 נקודה {EMOJI_STAR}", icon=EMOJI_PARTY)
+
 # --- Display Feedback (Always evaluated after potential state changes) ---
-# Handles messages set by incorrect guesses, reveals, hint errors etc.
-if 'message' in st.session_state and 'message_type' in st.session_state:
-    msg_type = st.session_state.message_type
-    message = st.session_state.message
-    # Avoid re-displaying success message right after rerun trigger
-    is_success_loading = (msg_type == "success" and "קבלו מילה חדשה" in message)
-
-    if not is_success_loading:
-        if msg_type == "success": feedback_area.success(message, icon=EMOJI_PARTY)
-        elif msg_type == "error": feedback_area.error(message, icon=EMOJI_WRONG)
-        elif msg_type == "info": feedback_area.info(message, icon=EMOJI_REVEAL)
-        elif msg_type == "warning": feedback_area.warning(message, icon=EMOJI_THINKING)
+# Handles messages set by correct and incorrect guesses, reveals, hint errors etc.
+if game.message and game.message_type:
+    msg_type = game.message_type
+    message = game.message
+
+    if msg_type == "success": feedback_area.success(message, icon=EMOJI_PARTY)
+    elif msg_type == "error": feedback_area.error(message, icon=EMOJI_WRONG)
+    elif msg_type == "info": feedback_area.info(message, icon=EMOJI_REVEAL)
+    elif msg_type == "warning": feedback_area.warning(message, icon=EMOJI_THINKING)
+
+    # Success messages are about the previous word - show them once only
+    if msg_type == "success":
+        game.clear_feedback()
+
+# --- Cache Stats (Sidebar) ---
+cache_stats = validity_cache.stats()
+st.sidebar.caption(f"מטמון בדיקת מילים: {cache_stats['hits']} פגיעות / {cache_stats['misses']} החטאות "
+                   f"({cache_stats['hit_rate']:.0%})")
 
 # --- Footer ---
 st.divider()
-st.caption(f"משחק 'מילים מבולבלות לפי רמות' | {EMOJI_BRAIN} מופעל בעזרת Streamlit ו-Google Gemini")
\ No newline at end of file
+st.caption(f"משחק 'מילים מבולבלות לפי רמות' | {EMOJI_BRAIN} מופעל בעזרת Streamlit ו-Google Gemini")
+
+game.save(score_store)
+record_rerun()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from game_state import GameState, MemoryScoreStore, SQLiteScoreStore, is_player_id, new_player_id, open_score_store
+
+
+def test_player_ids():
+    assert is_player_id(new_player_id())
+    assert not is_player_id("../etc/passwd") and not is_player_id(None)
+
+
+def test_save_writes_only_changes():
+    class CountingStore(MemoryScoreStore):
+        saves = 0
+
+        def save(self, *args):
+            self.saves += 1
+            super().save(*args)
+
+    store = CountingStore()
+    game = GameState("abcdef12", "קל")
+    game.save(store)
+    game.save(store)
+    game.score = 10
+    game.save(store)
+    assert store.saves == 2
+    assert store.load("abcdef12") == ("קל", 10, 0)
+
+
+def test_restore_ignores_unknown_levels():
+    game = GameState("abcdef12", "קל")
+    game.restore(("אגדי", 5, 2), levels=["קל"])
+    assert game.progress() == ("קל", 5, 2)
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = SQLiteScoreStore(str(tmp_path / "scores.sqlite3"))
+    store.save("abcdef12", "קשה", 30, 4)
+    assert SQLiteScoreStore(str(tmp_path / "scores.sqlite3")).load("abcdef12") == ("קשה", 30, 4)
+    assert store.load("00000000") is None
+
+
+def test_sqlite_store_prunes_expired_players_while_running(tmp_path):
+    store = SQLiteScoreStore(str(tmp_path / "scores.sqlite3"), ttl_seconds=60, prune_every=3)
+    store.save("aaaaaaaa", "קל", 1, 1)
+    store._conn.execute("UPDATE progress SET updated_at = ?", (time.time() - 120,)) # Last seen two minutes ago
+    store.save("bbbbbbbb", "קל", 2, 0)
+    assert store.load("aaaaaaaa") is not None # Not pruned yet
+    store.save("cccccccc", "קל", 3, 0) # Third save since opening: prunes
+    assert store.load("aaaaaaaa") is None
+    assert store.load("bbbbbbbb") == ("קל", 2, 0)
+
+
+def test_open_score_store_kinds():
+    assert isinstance(open_score_store("memory"), MemoryScoreStore)
+    assert open_score_store("none") is None
+    with pytest.raises(ValueError):
+        open_score_store("redis")
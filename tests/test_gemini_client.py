@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from gemini_client import FakeModel, GeminiClient
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    model = FakeModel(answer="כן", latency=0.3)
+    client = GeminiClient(model, max_concurrency=4)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(client.generate("האם המילה קיימת?").text)
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert results == ["כן"] * 8
+    assert client.stats()["upstream_calls"] == 1
+    assert client.stats()["coalesced_calls"] == 7
+    assert model.calls == 1
+    client.close()
+
+
+def test_different_configs_are_not_coalesced():
+    model = FakeModel(latency=0.1)
+    client = GeminiClient(model)
+    futures = [client.submit("prompt", {"temperature": t}) for t in (0.1, 0.2)]
+    for future in futures: future.result()
+    assert client.stats()["upstream_calls"] == 2
+    client.close()
+
+
+def test_failed_call_is_retried():
+    failures = [RuntimeError("boom")]
+
+    def responder(prompt):
+        if failures:
+            raise failures.pop()
+        return "תשובה"
+
+    model = FakeModel(responder=responder)
+    client = GeminiClient(model, retries=2, backoff=0)
+    assert client.generate("prompt").text == "תשובה"
+    assert model.calls == 2
+    assert client.stats()["upstream_calls"] == 1
+    client.close()
+
+
+def test_gives_up_after_the_last_retry():
+    model = FakeModel(failure_rate=1.0)
+    client = GeminiClient(model, retries=2, backoff=0)
+    with pytest.raises(RuntimeError):
+        client.generate("prompt")
+    assert model.calls == 3
+    client.close()
+
+
+def test_deadline_raises_timeout_error():
+    client = GeminiClient(FakeModel(latency=0.5))
+    with pytest.raises(TimeoutError):
+        client.generate("prompt", deadline=0.05)
+    client.close()
+
+
+def test_async_deadline_raises_timeout_error():
+    client = GeminiClient(FakeModel(latency=0.5))
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.generate_async("prompt", deadline=0.05))
+    client.close()
+
+
+def test_gemini_models_keep_their_own_keys(monkeypatch):
+    pytest.importorskip("google.generativeai")
+    from google.ai import generativelanguage as glm
+    from gemini_client import build_gemini_model
+
+    first, second = build_gemini_model("key-a", "gemini-x"), build_gemini_model("key-b", "gemini-x")
+    assert first._client is not second._client
+    requests = []
+
+    def generate_content(self, request, **kwargs):
+        requests.append((request, kwargs))
+        return glm.GenerateContentResponse(
+            candidates=[glm.Candidate(content=glm.Content(parts=[glm.Part(text="כן")]), finish_reason=1)])
+
+    monkeypatch.setattr(type(first._client), "generate_content", generate_content)
+    response = GeminiClient(first).generate("prompt", {"temperature": 0.0}, timeout=3)
+    assert response.text == "כן"
+    request, kwargs = requests[0]
+    assert request.model == "models/gemini-x" and kwargs == {"timeout": 3}
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from lexicon import AnagramIndex, Lexicon, letter_signature
+
+WORDS = ["בית", "תיב", "יבת", "שָׁלוֹם", "לשום", "ים", "מי", "אבא", "א"]
+
+
+@pytest.fixture(params=["memory", "compiled"])
+def lexicon(request, tmp_path):
+    lexicon = Lexicon(WORDS)
+    if request.param == "compiled":
+        lexicon.save(str(tmp_path / "lexicon.bin"))
+        lexicon = Lexicon.open(str(tmp_path / "lexicon.bin"))
+    return lexicon
+
+
+def test_lexicon_lookup(lexicon):
+    assert len(lexicon) == len(WORDS)
+    assert "שלום" in lexicon and "שָׁלוֹם" in lexicon
+    assert "כלב" not in lexicon
+    assert all(lexicon[lexicon.index(word)] == word for word in lexicon)
+    assert list(lexicon) == sorted(lexicon)
+
+
+def test_anagrams_group_words_with_the_same_letters(lexicon):
+    index = AnagramIndex(lexicon)
+    assert len(index) == len({letter_signature(word) for word in WORDS})
+    assert sorted(index.anagrams("תבי")) == ["בית", "יבת", "תיב"]
+    assert sorted(index.anagrams("שלום")) == ["לשום", "שלום"]
+    assert index.anagrams("א") == ("א",)
+    assert index.anagrams("כלב") == ()
+
+
+def test_final_letters_fold(lexicon):
+    index = AnagramIndex(lexicon)
+    assert sorted(index.anagrams("ים")) == ["ים", "מי"]
+    assert index.is_anagram_word("מי", "ים")
+    assert not index.is_anagram_word("כלב", "ים")
+
+
+def test_empty_lexicon(tmp_path):
+    Lexicon([]).save(str(tmp_path / "empty.bin"))
+    for lexicon in (Lexicon([]), Lexicon.open(str(tmp_path / "empty.bin"))):
+        assert len(lexicon) == 0
+        assert AnagramIndex(lexicon).anagrams("אב") == ()
+
+
+def test_load_shared_reuses_and_replaces_compiled_files(tmp_path):
+    word_file = tmp_path / "words.txt"
+    word_file.write_text("בית\nספר\n", encoding="utf-8")
+    first = Lexicon.load_shared(str(word_file), ["ים"], str(tmp_path))
+    assert list(first) == sorted(["בית", "ספר", "ים"])
+    assert Lexicon.load_shared(str(word_file), ["ים"], str(tmp_path)).path == first.path
+
+    second = Lexicon.load_shared(str(word_file), ["מי"], str(tmp_path))
+    assert second.path != first.path
+    assert sorted(p.name for p in tmp_path.glob("lexicon-*.bin")) == [os.path.basename(second.path)]
+    assert list(first) == sorted(["בית", "ספר", "ים"]) # Still mapped after its file was removed
@@ -0,0 +1,57 @@
+import sqlite3
+
+from rate_limit import RateLimiter
+
+
+def test_bucket_starts_full_and_refills():
+    limiter = RateLimiter({"clicks": (2.0, 3)})
+    assert [limiter.allow(("clicks", "p"), now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(("clicks", "p"), now=0.5) # One token back after 0.5s at 2/s
+    assert not limiter.allow(("clicks", "p"), now=0.5)
+    assert [limiter.allow(("clicks", "p"), now=100.0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(("clicks", "other"), now=100.0) # Each key has its own bucket
+
+
+def test_zero_rate_is_unlimited():
+    limiter = RateLimiter({"clicks": (0, 3)})
+    assert all(limiter.allow(("clicks", "p"), now=0.0) for _ in range(100))
+
+
+def test_rejected_call_takes_from_no_bucket():
+    limiter = RateLimiter({"session": (1.0, 5), "key": (1.0, 2)})
+    assert limiter.allow(("session", "p"), ("key", "k"), cost=2, now=0.0)
+    assert not limiter.allow(("session", "p"), ("key", "k"), now=0.0) # Key bucket is empty
+    assert limiter.allow(("session", "p"), cost=3, now=0.0) # Session still holds 3
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_reserve_keeps_tokens_for_other_callers():
+    limiter = RateLimiter({"key": (1.0, 10)})
+    assert [limiter.allow(("key", "k"), reserve=7, now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(("key", "k"), now=0.0) # Reserved tokens are still there for plain calls
+
+
+def test_shared_buckets_are_shared_between_limiters(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    limits = {"ai_key": (1.0, 4), "session": (1.0, 100)}
+    first = RateLimiter(limits, shared=("ai_key",), path=path)
+    second = RateLimiter(limits, shared=("ai_key",), path=path)
+    results = [limiter.allow(("ai_key", "secret"), ("session", "p"), now=0.0)
+               for limiter in (first, second, first, second, first)]
+    assert results == [True, True, True, True, False]
+    assert second.allow(("ai_key", "secret"), now=2.0) # Refilled from the shared timestamp
+    raw = sqlite3.connect(path).execute("SELECT key FROM buckets").fetchall()
+    assert raw and all("secret" not in key for (key,) in raw) # Keys are stored hashed
+
+
+def test_locked_shared_file_counts_as_rate_limited(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    limiter = RateLimiter({"ai_key": (1.0, 4), "session": (1.0, 4)}, shared=("ai_key",), path=path)
+    limiter._conn.execute("PRAGMA busy_timeout=0") # Don't wait the full timeout in a test
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    assert not limiter.allow(("ai_key", "k"), ("session", "p"), now=0.0)
+    assert limiter.stats()["db_errors"] == 1
+    other.execute("ROLLBACK")
+    # Nothing was taken by the failed call: all four session tokens are still there
+    assert all(limiter.allow(("ai_key", "k"), ("session", "p"), now=0.0) for _ in range(4))
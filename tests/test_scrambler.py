@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from lexicon import AnagramIndex, Lexicon, letter_signature
+from scrambler import ScrambleEngine, scramble_difficulty
+
+# Final letters fold to their regular form, as in lexicon.letter_signature
+FOLD = str.maketrans("ךםןףץ", "כמנפצ")
+
+WORDS = ["בית", "תיב", "יבת", "שלום", "לשום", "אבא", "ים", "מי", "מחשבה", "ירושלים", "התפתחויות"]
+
+
+@pytest.fixture
+def anagrams():
+    return AnagramIndex(Lexicon(WORDS)).anagrams
+
+
+@pytest.mark.parametrize("word", ["בית", "שלום", "אבא", "מחשבה", "ירושלים", "התפתחויות"])
+def test_draw_never_returns_the_word_or_a_real_anagram(word, anagrams):
+    engine = ScrambleEngine(WORDS, real_words=anagrams)
+    forbidden = {w.translate(FOLD) for w in anagrams(word) + (word,)}
+    rng = random.Random(0)
+    for low, high in [(0.0, 1.0), (0.0, 0.5), (0.5, 1.0)]:
+        for _ in range(200):
+            scrambled = engine.draw(word, low, high, rng)
+            assert letter_signature(scrambled) == letter_signature(word)
+            assert scrambled.translate(FOLD) not in forbidden
+
+
+def test_draw_falls_back_to_a_real_word_only_when_nothing_else_is_left(anagrams):
+    engine = ScrambleEngine(WORDS, real_words=anagrams)
+    assert engine.pool("ים") == []
+    assert engine.draw("ים").translate(FOLD) == "מי"
+
+
+def test_draw_without_letters_to_shuffle_returns_the_word():
+    engine = ScrambleEngine(["א", "אאא"])
+    assert engine.draw("א") == "א"
+    assert engine.draw("אאא") == "אאא"
+
+
+def test_pool_is_ranked_easiest_first(anagrams):
+    engine = ScrambleEngine(WORDS, real_words=anagrams)
+    pool = engine.pool("ירושלים")
+    assert len(pool) == len(set(pool))
+    clues = [scramble_difficulty("ירושלים", scrambled) for scrambled in pool]
+    assert clues == sorted(clues, reverse=True)
+
+
+def test_words_outside_the_list_get_a_pool_on_demand():
+    engine = ScrambleEngine(["שלום"])
+    assert engine.draw("תפוח") != "תפוח"
+    assert len(engine) == 2
+
+
+def test_shared_pools_match_built_pools(tmp_path, anagrams):
+    word_file = tmp_path / "words.txt"
+    word_file.write_text("\n".join(WORDS), encoding="utf-8")
+    lexicon = Lexicon.load_shared(str(word_file), [], str(tmp_path))
+    built = ScrambleEngine(WORDS, real_words=anagrams)
+    for _ in range(2): # Second load maps the files written by the first
+        shared = ScrambleEngine.load_shared(WORDS, lexicon, str(tmp_path), real_words=AnagramIndex(lexicon).anagrams)
+        assert shared._pools == {}
+        assert all(shared.pool(word) == built.pool(word) for word in WORDS)
+
+
+def test_load_shared_removes_pools_for_older_words(tmp_path, anagrams):
+    word_file = tmp_path / "words.txt"
+    word_file.write_text("\n".join(WORDS), encoding="utf-8")
+    lexicon = Lexicon.load_shared(str(word_file), [], str(tmp_path))
+    ScrambleEngine.load_shared(WORDS[:3], lexicon, str(tmp_path))
+    ScrambleEngine.load_shared(WORDS, lexicon, str(tmp_path))
+    assert len([p for p in tmp_path.glob("scrambles-*") if p.is_dir()]) == 1
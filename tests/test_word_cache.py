@@ -0,0 +1,72 @@
+import pytest
+
+from gemini_client import FakeModel, GeminiClient, fake_responder
+from word_cache import (ValidityCache, build_batch_validity_prompt, check_words_validity_batch,
+                        parse_batch_validity_answer)
+
+WORDS = ["בית", "ספר", "קקק"]
+
+
+def test_parse_accepts_numbering_styles():
+    text = "1: כן\n2. לא\n3) כן"
+    assert parse_batch_validity_answer(text, WORDS) == {"בית": True, "ספר": False, "קקק": True}
+    assert parse_batch_validity_answer("1 - כן\n  2 לא", WORDS) == {"בית": True, "ספר": False}
+
+
+@pytest.mark.parametrize("text", ["", None, "{\"1\": \"כן\"", "I don't know", "כן\nלא\nכן"])
+def test_parse_malformed_answers_give_no_verdicts(text):
+    assert parse_batch_validity_answer(text, WORDS) == {}
+
+
+def test_parse_ignores_extra_numbers_and_drops_conflicts():
+    text = "1: כן\n4: לא\n0: כן\n2: כן\n2: לא\nהסבר נוסף"
+    assert parse_batch_validity_answer(text, WORDS) == {"בית": True}
+
+
+def test_fake_responder_round_trip():
+    prompt = build_batch_validity_prompt(WORDS)
+    assert parse_batch_validity_answer(fake_responder(prompt, "לא"), WORDS) == dict.fromkeys(WORDS, False)
+
+
+def _client(responder):
+    model = FakeModel(responder=responder)
+    return model, GeminiClient(model, retries=0, backoff=0)
+
+
+def test_batch_makes_one_call():
+    model, client = _client(fake_responder)
+    assert check_words_validity_batch(client, WORDS) == dict.fromkeys(WORDS, True)
+    assert model.calls == 1
+
+
+def test_missing_words_fall_back_to_single_calls():
+    def responder(prompt):
+        if "1." in prompt: # The batch prompt: answer only the first word
+            return "1: כן\n7: לא"
+        return "לא" if "ספר" in prompt else "כן"
+
+    model, client = _client(responder)
+    assert check_words_validity_batch(client, WORDS) == {"בית": True, "ספר": False, "קקק": True}
+    assert model.calls == 3 # One batch call plus one per missing word
+
+
+def test_failed_batch_and_failed_fallback():
+    def responder(prompt):
+        if "1." in prompt or "קקק" in prompt:
+            raise RuntimeError("API down")
+        return "כן"
+
+    _, client = _client(responder)
+    assert check_words_validity_batch(client, WORDS) == {"בית": True, "ספר": True, "קקק": None}
+
+
+def test_cache_is_read_first_and_filled(tmp_path):
+    cache = ValidityCache(path=str(tmp_path / "validity.sqlite3"))
+    cache.put("בית", False)
+    model, client = _client(fake_responder)
+    results = check_words_validity_batch(client, WORDS + ["בית"], cache=cache, batch_size=1)
+    assert results == {"בית": False, "ספר": True, "קקק": True}
+    assert model.calls == 2
+    assert cache.get("ספר") is True
+    check_words_validity_batch(client, WORDS, cache=cache)
+    assert model.calls == 2 # Everything cached now
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from word_deck import draw_word, shuffled_index
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 100, 1000, 4097])
+@pytest.mark.parametrize("seed", [0, 1, 12345, 2**32 - 1])
+def test_shuffled_index_is_a_permutation(size, seed):
+    assert sorted(shuffled_index(position, size, seed) for position in range(size)) == list(range(size))
+
+
+def test_shuffled_index_depends_on_seed():
+    orders = {tuple(shuffled_index(position, 50, seed) for position in range(50)) for seed in range(5)}
+    assert len(orders) == 5
+
+
+def test_draw_word_does_not_repeat_within_a_pass():
+    words = [f"w{i}" for i in range(37)]
+    rng = random.Random(3)
+    cursor = None
+    for _ in range(3):
+        drawn = []
+        for _ in range(len(words)):
+            word, cursor = draw_word(words, cursor, rng=rng)
+            drawn.append(word)
+        assert sorted(drawn) == sorted(words)
+
+
+def test_draw_word_rejects_empty_deck():
+    with pytest.raises(ValueError):
+        draw_word([])
+
+
+@pytest.mark.parametrize("size", [2, 3, 5, 41])
+def test_avoid_keeps_every_word_in_every_pass(size):
+    words = [f"w{i}" for i in range(size)]
+    rng = random.Random(size)
+    word, cursor = None, None
+    for _ in range(60):
+        drawn = []
+        for _ in range(size):
+            previous = word
+            word, cursor = draw_word(words, cursor, avoid=word, rng=rng)
+            assert word != previous
+            drawn.append(word)
+        assert sorted(drawn) == sorted(words)
+
+
+def test_avoid_with_a_single_word_deck():
+    assert draw_word(["a"], avoid="a")[0] == "a"
+    assert draw_word(["a", "a"], avoid="a")[0] == "a"
@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from lexicon import normalize_word
+from shared_store import open_cache_db
+
+# --- Cache Location ---
+CACHE_DIR = os.getenv(
+    "WORDGAME_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+VALIDITY_GENERATION_CONFIG = {'candidate_count': 1, 'temperature': 0.0} # Deterministic yes/no
+# Batch answer lines look like "12: כן" (also accepts "12." / "12)" / "12 -")
+_BATCH_ANSWER_RE = re.compile(r"^\s*(\d+)\s*[.:)\-]?\s*(כן|לא)")
+
+
+def build_validity_prompt(word):
+    """Simple prompt focused on getting a clear yes/no for one word."""
+    return f"האם '{word}' היא מילה תקינה ונפוצה בשפה העברית המודרנית? ענה רק 'כן' או 'לא'."
+
+
+def parse_validity_answer(text):
+    """Returns True/False for answers starting with 'כן'/'לא', None if unclear."""
+    answer = (text or "").strip().lower()
+    if answer.startswith("כן"): return True
+    if answer.startswith("לא"): return False
+    return None
+
+
+def build_batch_validity_prompt(words):
+    """One prompt asking for a numbered yes/no verdict per word."""
+    word_lines = "\n".join(f"{i}. {word}" for i, word in enumerate(words, start=1))
+    return f"""
+לכל אחת מהמילים הממוספרות הבאות, האם היא מילה תקינה ונפוצה בשפה העברית המודרנית?
+ענה בשורה נפרדת לכל מילה, בפורמט 'מספר: כן' או 'מספר: לא', בלי טקסט נוסף.
+{word_lines}
+"""
+
+
+def parse_batch_validity_answer(text, words):
+    """Parses numbered verdicts into {word: True/False}. Words with missing or
+    conflicting answers are left out, so callers can re-check them one by one."""
+    verdicts = {}
+    conflicts = set()
+    for line in (text or "").splitlines():
+        match = _BATCH_ANSWER_RE.match(line)
+        if not match: continue
+        index = int(match.group(1)) - 1
+        if not 0 <= index < len(words): continue
+        word, verdict = words[index], match.group(2) == "כן"
+        if verdicts.get(word, verdict) != verdict:
+            conflicts.add(word)
+        verdicts[word] = verdict
+    for word in conflicts:
+        del verdicts[word]
+    return verdicts
+
+
+def check_words_validity_batch(client, words, cache=None, batch_size=50, timeout=30):
+    """Checks many words with one model call per `batch_size` words.
+
+    Cached verdicts are used first and new ones are stored in `cache`. Words
+    the batch answer leaves ambiguous fall back to single-word calls, submitted
+    together. `timeout` applies to every model call.
+    Returns {normalized word: True/False/None}, None meaning still unknown.
+    """
+    results = {}
+    pending = []
+    for word in dict.fromkeys(filter(None, map(normalize_word, words))):
+        cached = cache.get(word) if cache is not None else None
+        if cached is not None:
+            results[word] = cached
+        else:
+            pending.append(word)
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            response = client.generate(build_batch_validity_prompt(batch),
+                                       generation_config=VALIDITY_GENERATION_CONFIG, timeout=timeout)
+            verdicts = parse_batch_validity_answer(response.text if response.parts else "", batch)
+        except Exception:
+            verdicts = {} # Whole batch falls back to single-word calls
+        # Ambiguous words are re-checked one by one, all submitted at once so the client's
+        # pool runs them in parallel instead of one after another on this thread
+        fallbacks = {word: client.submit(build_validity_prompt(word), VALIDITY_GENERATION_CONFIG, timeout)
+                     for word in batch if verdicts.get(word) is None}
+        for word in batch:
+            verdict = verdicts.get(word)
+            if word in fallbacks:
+                try:
+                    response = fallbacks[word].result(timeout=timeout * (client.retries + 1))
+                    verdict = parse_validity_answer(response.text) if response.parts else None
+                except Exception:
+                    verdict = None
+            if cache is not None:
+                cache.put(word, verdict)
+            results[word] = verdict
+    return results
+
+
+class ValidityCache:
+    """Process-wide, disk-backed cache of yes/no word validity verdicts.
+
+    A small in-memory LRU sits in front of a SQLite table so hot words never
+    touch the disk, while the table keeps verdicts across restarts.
+    Entries older than ``ttl_seconds`` are treated as misses and pruned, on
+    open and then every ``prune_every`` inserts.
+    With several workers on one file, pass max_memory_entries=0: every
+    worker then reads the shared table, so one worker's verdicts are hits for all.
+    """
+
+    def __init__(self, path=None, max_memory_entries=5000, max_disk_entries=200_000,
+                 ttl_seconds=30 * 24 * 3600, prune_every=1000):
+        self.path = path or os.path.join(CACHE_DIR, "validity.sqlite3")
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        self._puts_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict() # word -> (verdict, stored_at)
+        self._lock = threading.Lock()
+
+        # One connection shared by all Streamlit script threads, guarded by _lock
+        self._conn = open_cache_db(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validity ("
+            " word TEXT PRIMARY KEY, verdict INTEGER NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._prune()
+
+    def get(self, word):
+        """Returns the cached verdict (True/False) or None on a miss."""
+        key = normalize_word(word)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._memory[key] # Expired
+
+            row = self._conn.execute(
+                "SELECT verdict, stored_at FROM validity WHERE word = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                verdict = bool(row[0])
+                self._remember(key, verdict, row[1])
+                self.hits += 1
+                return verdict
+
+            self.misses += 1
+            return None
+
+    def put(self, word, verdict):
+        """Stores a definite verdict. Unclear answers (None) are never cached."""
+        if verdict is None: return
+        key = normalize_word(word)
+        if not key: return
+        now = time.time()
+        with self._lock:
+            self._remember(key, bool(verdict), now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validity (word, verdict, stored_at) VALUES (?, ?, ?)",
+                (key, int(bool(verdict)), now),
+            )
+            self._conn.commit()
+            self._puts_since_prune += 1
+            prune = self._puts_since_prune >= self.prune_every
+        if prune:
+            self._prune() # Keeps long-running workers within max_disk_entries and the TTL
+
+    def stats(self):
+        """Returns hit/miss counters and sizes for display or export."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, verdict, stored_at):
+        # Caller holds the lock
+        self._memory[key] = (verdict, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self):
+        """Drops expired rows and trims the table to max_disk_entries (oldest first)."""
+        with self._lock:
+            self._puts_since_prune = 0
+            self._conn.execute(
+                "DELETE FROM validity WHERE stored_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.execute(
+                "DELETE FROM validity WHERE word IN ("
+                " SELECT word FROM validity ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self._conn.commit()
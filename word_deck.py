@@ -0,0 +1,59 @@
+import random
+
+# A deck cursor is just (seed, position): the seed picks one pseudo-random
+# permutation of the level's word list and the position says how far into it
+# the session has drawn. Nothing is copied or shuffled in memory.
+
+_FEISTEL_ROUNDS = 4
+_AVOID_TRIES = 16 # Reseeds allowed to keep a new pass from opening with `avoid`
+
+
+def shuffled_index(position, size, seed):
+    """Maps position -> index in range(size), a different permutation per seed.
+
+    Uses a small balanced Feistel network over the next power of four, plus
+    cycle walking to stay inside range(size). Each call is O(1) on average
+    (fewer than four walks expected), whatever the deck size.
+    """
+    if size <= 1:
+        return 0
+    half_bits = ((size - 1).bit_length() + 1) // 2
+    mask = (1 << half_bits) - 1
+    x = position
+    while True:
+        left, right = x >> half_bits, x & mask
+        for round_number in range(_FEISTEL_ROUNDS):
+            # hash() of an int tuple is stable across processes (no hash randomization)
+            left, right = right, left ^ (hash((seed, round_number, right)) & mask)
+        x = (left << half_bits) | right
+        if x < size:
+            return x
+
+
+def new_cursor(rng=random):
+    """Starts a fresh shuffled pass through a deck."""
+    return (rng.getrandbits(32), 0)
+
+
+def draw_word(words, cursor=None, avoid=None, rng=random):
+    """Draws the next word from a deck and returns (word, new_cursor).
+
+    No word repeats until all `len(words)` words have been drawn, then a new
+    pass with a new seed begins. A new pass that would open with `avoid`
+    (usually the previous word) is reseeded, so passes don't repeat back to
+    back and every pass still holds each word exactly once.
+    """
+    if not words:
+        raise ValueError("cannot draw from an empty deck")
+    if cursor is not None and cursor[1] < len(words):
+        seed, position = cursor
+    else:
+        seed, position = new_cursor(rng)
+    if position == 0 and len(words) > 1:
+        # A few tries are plenty (a bad opening has odds 1/len(words)); the cap only
+        # matters when every entry equals `avoid`
+        for _ in range(_AVOID_TRIES):
+            if words[shuffled_index(0, len(words), seed)] != avoid:
+                break
+            seed, position = new_cursor(rng)
+    return words[shuffled_index(position, len(words), seed)], (seed, position + 1)